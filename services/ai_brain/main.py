@@ -3301,6 +3301,18 @@ Example:
     return {"status": "ok", "message": "Observation received"}
 
 
+class ObservationBatch(BaseModel):
+    batch: List[DesktopObservation]
+
+
+@app.post("/observations/batch")
+async def receive_observation_batch(payload: ObservationBatch):
+    """Receive a batch of service observations in one round trip"""
+    for obs in payload.batch:
+        await receive_observation(obs)
+    return {"status": "ok", "message": f"{len(payload.batch)} observations received"}
+
+
 @app.get("/observations")
 async def get_observations(limit: int = 20):
     """Get recent desktop observations from database"""
@@ -0,0 +1,37 @@
+"""Shared fixtures for the per-service test suites."""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+from sqlmodel import SQLModel
+
+SERVICES_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SERVICES_DIR.parent
+
+
+@pytest.fixture
+def load_service(monkeypatch):
+    """Return a loader that imports services/<name>/main.py fresh.
+
+    Keyword arguments are set as environment variables before the import.
+    The service directory and the repo root go on sys.path so its
+    `autonomy`, `kilo_integration` and `shared` imports resolve.
+    """
+    def load(name, **env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        service_dir = SERVICES_DIR / name
+        monkeypatch.syspath_prepend(str(REPO_ROOT))
+        monkeypatch.syspath_prepend(str(service_dir))
+        # every service has its own main/autonomy modules; don't pick up another's
+        for module_name in ("main", "autonomy"):
+            sys.modules.pop(module_name, None)
+        # tables declared at import must not collide with a previous load
+        SQLModel.metadata.clear()
+        spec = importlib.util.spec_from_file_location(f"{name}_main_under_test", service_dir / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
@@ -26,7 +26,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 # Add services directory to path for kilo_integration
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from kilo_integration import KiloNerve
-from shared.utils.persona import get_quip
+from shared.utils.persona import get_budget_ok_quip, get_budget_warning_quip
 from autonomy import check_budgets
 
 # Database setup
@@ -45,6 +45,11 @@ def on_startup():
     """Initialize database tables on startup."""
     SQLModel.metadata.create_all(engine)
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
+
 @app.get("/health")
 def health():
     return {"status": "ok", "message": "I'm keeping an eye on your shiny gold coins! 💰"}
@@ -140,7 +145,7 @@ def list_budget_status():
     """Autonomous budget status check with Gremlin flavor."""
     status = check_budgets(engine)
     over = [b for b in status if b["over_budget"]]
-    message = get_quip("budget_warning") if over else get_quip("budget_ok")
+    message = get_budget_warning_quip() if over else get_budget_ok_quip()
     return {
         "budgets": status,
         "gremlin_message": message
@@ -1,13 +1,21 @@
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from starlette.responses import JSONResponse
 import httpx
+import orjson
 import os
 from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlalchemy import event
 from typing import Optional
+from urllib.parse import urlparse
 import secrets
 import hashlib
+import hmac
+import base64
+import json
+import subprocess
 import datetime
 import time
 import asyncio
@@ -15,22 +23,27 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI(title="Kilos API Gateway")
-
-# Add CORS middleware to allow frontend access
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for local development
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = FastAPI(title="Kilos API Gateway", default_response_class=ORJSONResponse)
 
 # admin tokens DB (simple centralized token store for admin UI/automation)
 DB_URL = os.getenv("GATEWAY_DB_URL", "sqlite:////tmp/gateway.db")
 engine = create_engine(DB_URL, echo=False)
 
 
+if DB_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        # Token lookups are read-heavy with rare writes: WAL lets readers
+        # proceed alongside a writer, mmap avoids read() syscalls.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=134217728")
+        cur.execute("PRAGMA cache_size=-16000")
+        cur.close()
+
+
 class AdminToken(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     label: Optional[str] = None
@@ -39,9 +52,17 @@ class AdminToken(SQLModel, table=True):
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
 
+# Bootstrap admin key (static), read once at startup
+_LIBRARY_ADMIN_KEY = (os.environ.get('LIBRARY_ADMIN_KEY') or '').strip() or None
+
+
 # Persistent HTTP client for proxying requests (prevents connection exhaustion)
 http_client: Optional[httpx.AsyncClient] = None
 
+# Dedicated proxy pools keyed by upstream origin so a slow service cannot
+# exhaust the connections a fast one needs (aliases share their target's pool)
+proxy_pools: dict = {}
+
 
 @app.on_event("startup")
 async def startup():
@@ -51,15 +72,23 @@ async def startup():
     except Exception:
         pass
     
-    # Create persistent HTTP client with connection pooling
+    # Create persistent HTTP client with connection pooling, shared by the
+    # proxy routes and the admin/notify/observation endpoints.
     # This prevents "client has been closed" errors and improves performance
     http_client = httpx.AsyncClient(
         timeout=httpx.Timeout(120.0, connect=10.0),  # 120s for LLM/OCR, 10s connect timeout
-        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=60),
         follow_redirects=True
     )
     logger.info("Gateway HTTP client initialized with connection pooling")
 
+    for origin in set(SERVICE_ORIGINS.values()):
+        proxy_pools[origin] = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+            follow_redirects=True
+        )
+
 
 @app.on_event("shutdown")
 async def shutdown():
@@ -67,6 +96,16 @@ async def shutdown():
     if http_client:
         await http_client.aclose()
         logger.info("Gateway HTTP client closed")
+    for pool in proxy_pools.values():
+        await pool.aclose()
+    proxy_pools.clear()
+
+
+def _shared_client() -> httpx.AsyncClient:
+    """Return the gateway's pooled HTTP client, shared by all outbound calls."""
+    if not http_client:
+        raise HTTPException(status_code=503, detail="Gateway HTTP client not initialized")
+    return http_client
 
 
 def _hash_token(token: str) -> str:
@@ -90,88 +129,111 @@ def _hash_token(token: str) -> str:
         return h.hexdigest()
 
 
-def _validate_header_token(header_token: Optional[str]) -> bool:
+def _validate_header_token_sync(header_token: Optional[str], sess: Optional[Session] = None) -> bool:
     """
     Validate a token against stored hashes.
     Supports both bcrypt and SHA256 hashes for backward compatibility.
+    Reuses ``sess`` when the caller already holds a session.
     """
     if not header_token:
         return False
+    if sess is None:
+        with Session(engine) as own_sess:
+            return _validate_header_token_sync(header_token, own_sess)
     try:
         # Pre-compute SHA256 hash once for efficiency
         sha256_hash = hashlib.sha256(header_token.encode()).hexdigest()
-        
-        with Session(engine) as sess:
-            # Get all non-revoked tokens
-            q = sess.exec(select(AdminToken).where(AdminToken.revoked == False))
-
-            for token_record in q.all():
-                stored_hash = token_record.token_hash
-
-                # Check if it's a bcrypt hash (starts with $2b$)
-                if stored_hash.startswith('$2b$'):
-                    try:
-                        import bcrypt
-                        if bcrypt.checkpw(header_token.encode(), stored_hash.encode('ascii')):
-                            return True
-                    except ImportError:
-                        pass
-                else:
-                    # SHA256 hash - simple comparison (use pre-computed hash)
-                    if sha256_hash == stored_hash:
+
+        # Get all non-revoked tokens
+        q = sess.exec(select(AdminToken).where(AdminToken.revoked == False))
+
+        for token_record in q.all():
+            stored_hash = token_record.token_hash
+
+            # Check if it's a bcrypt hash (starts with $2b$)
+            if stored_hash.startswith('$2b$'):
+                try:
+                    import bcrypt
+                    if bcrypt.checkpw(header_token.encode(), stored_hash.encode('ascii')):
                         return True
+                except ImportError:
+                    pass
+            else:
+                # SHA256 hash - simple comparison (use pre-computed hash)
+                if sha256_hash == stored_hash:
+                    return True
 
-            return False
+        return False
     except Exception:
         return False
 
 
-def _is_admin_request(request: Request) -> bool:
+async def _validate_header_token(header_token: Optional[str]) -> bool:
+    """Validate a token without blocking the event loop.
+
+    The SQLite lookup (and bcrypt check) is synchronous, so run it in a
+    worker thread.
+    """
+    if not header_token:
+        return False
+    return await asyncio.to_thread(_validate_header_token_sync, header_token)
+
+
+def _secret_matches(candidate: str, secret: Optional[str]) -> bool:
+    """Constant-time comparison of a supplied credential against a secret."""
+    if not secret:
+        return False
+    return hmac.compare_digest(candidate.strip().encode(), secret.encode())
+
+
+async def _is_admin_request(request: Request) -> bool:
     """Return True if the request contains a valid admin credential.
 
     Accepts either a stored admin token (X-Admin-Token), or the bootstrap
     LIBRARY_ADMIN_KEY for environments still using that static key.
     """
     header = request.headers.get('x-admin-token')
-    library_admin_key = os.environ.get('LIBRARY_ADMIN_KEY')
 
-    if header and library_admin_key and header.strip() == library_admin_key.strip():
+    if header and _secret_matches(header, _LIBRARY_ADMIN_KEY):
         return True
 
     auth_header = request.headers.get('authorization')
-    if auth_header and library_admin_key and library_admin_key in auth_header:
-        return True
+    if auth_header and _LIBRARY_ADMIN_KEY:
+        scheme, _, credential = auth_header.strip().partition(' ')
+        if scheme.lower() == 'bearer' and _secret_matches(credential, _LIBRARY_ADMIN_KEY):
+            return True
 
-    return _validate_header_token(header)
+    return await _validate_header_token(header)
 
 
-@app.post("/admin/tokens")
-async def create_admin_token(request: Request):
-    """Create a new admin token. If this is the first token ever created, allow creation without auth.
-    Otherwise require X-Admin-Token header with a valid token."""
-    header = request.headers.get("x-admin-token")
-    # allow first token creation if DB empty
+def _create_admin_token_sync(header: Optional[str]) -> dict:
+    """Check authorization and insert a new token in a single session."""
     with Session(engine) as sess:
-        existing = sess.exec(select(AdminToken)).all()
-        count = len(existing)
-    if count > 0 and not _validate_header_token(header):
-        raise HTTPException(status_code=401, detail="Unauthorized")
+        # allow first token creation if DB empty
+        has_tokens = sess.exec(select(AdminToken.id).limit(1)).first() is not None
+        if has_tokens and not _validate_header_token_sync(header, sess):
+            raise HTTPException(status_code=401, detail="Unauthorized")
 
-    new_token = secrets.token_urlsafe(32)
-    token_hash = _hash_token(new_token)
-    at = AdminToken(label="generated", token_hash=token_hash)
-    with Session(engine) as sess:
+        new_token = secrets.token_urlsafe(32)
+        at = AdminToken(label="generated", token_hash=_hash_token(new_token))
         sess.add(at)
         sess.commit()
         sess.refresh(at)
+        return {"id": at.id, "token": new_token}
 
-    return {"id": at.id, "token": new_token}
+
+@app.post("/admin/tokens")
+async def create_admin_token(request: Request):
+    """Create a new admin token. If this is the first token ever created, allow creation without auth.
+    Otherwise require X-Admin-Token header with a valid token."""
+    header = request.headers.get("x-admin-token")
+    return await asyncio.to_thread(_create_admin_token_sync, header)
 
 
 @app.get("/admin/tokens")
 async def list_admin_tokens(request: Request):
     header = request.headers.get("x-admin-token")
-    if not _validate_header_token(header):
+    if not await _validate_header_token(header):
         raise HTTPException(status_code=401, detail="Unauthorized")
     out = []
     with Session(engine) as sess:
@@ -184,7 +246,7 @@ async def list_admin_tokens(request: Request):
 @app.post("/admin/tokens/{token_id}/revoke")
 async def revoke_admin_token(token_id: int, request: Request):
     header = request.headers.get("x-admin-token")
-    if not _validate_header_token(header):
+    if not await _validate_header_token(header):
         raise HTTPException(status_code=401, detail="Unauthorized")
     with Session(engine) as sess:
         row = sess.get(AdminToken, token_id)
@@ -204,7 +266,7 @@ async def validate_admin_token(payload: dict = None, request: Request = None):
     if payload and isinstance(payload, dict):
         body_token = payload.get("token")
     token = header or body_token
-    if not token or not _validate_header_token(token):
+    if not token or not await _validate_header_token(token):
         raise HTTPException(status_code=401, detail="Invalid")
     return {"valid": True}
 
@@ -213,10 +275,9 @@ async def validate_admin_token(payload: dict = None, request: Request = None):
 async def status():
     return {"status": "ok"}
 
-SERVICE_URLS = {
+SERVICE_CANONICAL = {
     "meds": os.getenv("MEDS_URL", "http://kilo-meds:9000"),
     "reminder": os.getenv("REMINDER_URL", "http://kilo-reminder:9002"),
-    "reminders": os.getenv("REMINDER_URL", "http://kilo-reminder:9002"),
     "habits": os.getenv("HABITS_URL", "http://kilo-habits:9000"),
     "ai_brain": os.getenv("AI_BRAIN_URL", "http://kilo-ai-brain:9004"),
     "financial": os.getenv("FINANCIAL_URL", "http://kilo-financial:9005"),
@@ -228,10 +289,25 @@ SERVICE_URLS = {
     "security_monitor": os.getenv("SECURITY_MONITOR_URL", "http://security-monitor:8001"),
     "drone_control": os.getenv("DRONE_CONTROL_URL", "http://drone-control:8002"),
     "briefing": os.getenv("BRIEFING_URL", "http://briefing:8003"),
-    "chat": os.getenv("AI_BRAIN_URL", "http://kilo-ai-brain:9004"),
-    "library": os.getenv("LIBRARY_OF_TRUTH_URL", "http://kilo-library:9006"),
 }
 
+# Alternate route names that proxy to the same backend (alias -> canonical)
+SERVICE_ALIASES = {
+    "reminders": "reminder",
+    "chat": "ai_brain",
+    "library": "library_of_truth",
+}
+
+SERVICE_URLS = {
+    **SERVICE_CANONICAL,
+    **{alias: SERVICE_CANONICAL[target] for alias, target in SERVICE_ALIASES.items()},
+}
+
+# Per-service values _proxy needs on every request, computed once
+SERVICE_BASE = {name: url.rstrip("/") for name, url in SERVICE_URLS.items()}
+SERVICE_HOSTS = {name: urlparse(url).hostname for name, url in SERVICE_URLS.items()}
+SERVICE_ORIGINS = {name: f"{urlparse(url).scheme}://{urlparse(url).netloc}" for name, url in SERVICE_URLS.items()}
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
@@ -251,19 +327,20 @@ async def agent_notify(payload: dict):
         # Forward to Socket.IO service for real-time push to frontend
         socketio_url = os.getenv("SOCKETIO_URL", "http://kilo-socketio:9010")
 
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            await client.post(
-                f"{socketio_url}/emit",
-                json={
-                    "event": "notification",
-                    "data": {
-                        "type": notification_type,
-                        "content": content,
-                        "metadata": metadata,
-                        "timestamp": datetime.datetime.now().isoformat()
-                    }
+        client = _shared_client()
+        await client.post(
+            f"{socketio_url}/emit",
+            json={
+                "event": "notification",
+                "data": {
+                    "type": notification_type,
+                    "content": content,
+                    "metadata": metadata,
+                    "timestamp": datetime.datetime.now().isoformat()
                 }
-            )
+            },
+            timeout=3.0
+        )
 
         logger.info(f"Notification forwarded: {notification_type} - {content}")
         return {"status": "ok", "message": "Notification sent"}
@@ -279,80 +356,90 @@ async def admin_ai_brain_metrics(request: Request):
 
     Validates X-Admin-Token using the gateway's token store. Returns raw Prometheus metrics text.
     """
-    if not _is_admin_request(request):
+    if not await _is_admin_request(request):
         raise HTTPException(status_code=401, detail='Unauthorized')
 
     service_url = SERVICE_URLS.get('ai_brain')
     if not service_url:
         raise HTTPException(status_code=404, detail='Service not found')
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            resp = await client.get(f"{service_url.rstrip('/')}/metrics", headers={"X-Admin-Token": header})
-            return Response(content=resp.content, media_type=resp.headers.get('content-type','text/plain'), status_code=resp.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=str(e))
+    header = request.headers.get('x-admin-token')
+    client = _shared_client()
+    try:
+        resp = await client.get(f"{service_url.rstrip('/')}/metrics", headers={"X-Admin-Token": header}, timeout=10.0)
+        return Response(content=resp.content, media_type=resp.headers.get('content-type','text/plain'), status_code=resp.status_code)
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+async def _tcp_probe(host: str, port: int, timeout: float = 2.0) -> bool:
+    """Return True if a TCP connection to host:port succeeds within timeout."""
+    try:
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except Exception:
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return True
 
 
 @app.get("/admin/status")
 async def admin_status():
     """Aggregate health status from all backend services + k3s + beelink"""
-    import httpx
-    import subprocess
-    from datetime import datetime
-    from kubernetes import client, config
-    from kubernetes.client.rest import ApiException
-
     results = {}
     
     # Check backend services
-    async with httpx.AsyncClient(timeout=2.0) as client_http:
-        for name, service_url in SERVICE_URLS.items():
-            svc_entry = {"ok": False, "checked_at": datetime.utcnow().isoformat(), "message": None}
-            health_url = f"{service_url.rstrip('/')}/health"
+    client_http = _shared_client()
+    # Probe each backend once; aliases reuse the canonical result below
+    for name, service_url in SERVICE_CANONICAL.items():
+        svc_entry = {"ok": False, "checked_at": datetime.datetime.utcnow().isoformat(), "message": None}
+        health_url = f"{service_url.rstrip('/')}/health"
+        try:
+            resp = await client_http.get(health_url, timeout=2.0)
+            svc_entry["ok"] = resp.status_code < 400
             try:
-                resp = await client_http.get(health_url)
-                svc_entry["ok"] = resp.status_code < 400
-                try:
-                    svc_entry["message"] = resp.json()
-                except Exception:
-                    svc_entry["message"] = resp.text
-            except Exception as e:
-                svc_entry["message"] = str(e)
+                svc_entry["message"] = orjson.loads(resp.content)
+            except Exception:
+                svc_entry["message"] = resp.text
+        except Exception as e:
+            svc_entry["message"] = str(e)
+
+        results[name] = svc_entry
 
-            results[name] = svc_entry
+    for alias, target in SERVICE_ALIASES.items():
+        results[alias] = results[target]
+
+    # Check Beelink status
+    beelink_host = os.getenv("BEELINK_HOST", "192.168.68.51")
+    try:
+        # TCP connect to the llama.cpp port: no fork, no raw-socket privilege
+        beelink_online = await _tcp_probe(beelink_host, 11434, timeout=2.0)
+        results["beelink"] = {
+            "ok": beelink_online,
+            "checked_at": datetime.datetime.utcnow().isoformat(),
+            "message": {"status": "online" if beelink_online else "offline", "host": beelink_host}
+        }
         
-        # Check Beelink status
-        beelink_host = os.getenv("BEELINK_HOST", "192.168.68.51")
-        try:
-            result = subprocess.run(
-                ["ping", "-c", "1", "-W", "2", beelink_host],
-                capture_output=True, timeout=3
-            )
-            beelink_online = result.returncode == 0
-            results["beelink"] = {
-                "ok": beelink_online,
-                "checked_at": datetime.utcnow().isoformat(),
-                "message": {"status": "online" if beelink_online else "offline", "host": beelink_host}
-            }
-            
-            # Check llama.cpp if beelink is online
-            if beelink_online:
-                llama_url = f"http://{beelink_host}:11434/health"
-                try:
-                    resp = await client_http.get(llama_url)
-                    results["llama"] = {
-                        "ok": resp.status_code < 400,
-                        "checked_at": datetime.utcnow().isoformat(),
-                        "message": {"status": "running", "url": llama_url}
-                    }
-                except Exception:
-                    results["llama"] = {"ok": False, "checked_at": datetime.utcnow().isoformat(), "message": "Not responding"}
-            else:
-                results["llama"] = {"ok": False, "checked_at": datetime.utcnow().isoformat(), "message": "Beelink offline"}
-        except Exception as e:
-            results["beelink"] = {"ok": False, "checked_at": datetime.utcnow().isoformat(), "message": str(e)}
-            results["llama"] = {"ok": False, "checked_at": datetime.utcnow().isoformat(), "message": "Check failed"}
+        # Check llama.cpp if beelink is online
+        if beelink_online:
+            llama_url = f"http://{beelink_host}:11434/health"
+            try:
+                resp = await client_http.get(llama_url, timeout=2.0)
+                results["llama"] = {
+                    "ok": resp.status_code < 400,
+                    "checked_at": datetime.datetime.utcnow().isoformat(),
+                    "message": {"status": "running", "url": llama_url}
+                }
+            except Exception:
+                results["llama"] = {"ok": False, "checked_at": datetime.datetime.utcnow().isoformat(), "message": "Not responding"}
+        else:
+            results["llama"] = {"ok": False, "checked_at": datetime.datetime.utcnow().isoformat(), "message": "Beelink offline"}
+    except Exception as e:
+        results["beelink"] = {"ok": False, "checked_at": datetime.datetime.utcnow().isoformat(), "message": str(e)}
+        results["llama"] = {"ok": False, "checked_at": datetime.datetime.utcnow().isoformat(), "message": "Check failed"}
     
     # Infer k3s status from service health (simpler than K8s API which isn't accessible)
     # Count healthy services as a proxy for pod health
@@ -361,7 +448,7 @@ async def admin_status():
     
     results["k3s"] = {
         "ok": services_healthy >= (services_checked * 0.5),  # At least 50% healthy
-        "checked_at": datetime.utcnow().isoformat(),
+        "checked_at": datetime.datetime.utcnow().isoformat(),
         "message": {
             "status": "inferred_from_services",
             "services_total": services_checked,
@@ -384,7 +471,7 @@ async def admin_status():
     out["finance"] = out.get("financial", out.get("finance", False))
 
     out["status"] = "online" if all_ok else "degraded"
-    out["checked_at"] = datetime.utcnow().isoformat()
+    out["checked_at"] = datetime.datetime.utcnow().isoformat()
     out["details"] = results
 
     return out
@@ -436,12 +523,9 @@ async def admin_metrics_summary(request: Request):
     JSON payload so the admin UI can render a status card without parsing the
     entire exposition format.
     """
-    if not _is_admin_request(request):
+    if not await _is_admin_request(request):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    import httpx
-    from datetime import datetime
-
     services_to_query = {
         "meds": SERVICE_URLS.get("meds"),
         "reminder": SERVICE_URLS.get("reminder"),
@@ -449,27 +533,27 @@ async def admin_metrics_summary(request: Request):
     }
 
     results = {}
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        for name, base_url in services_to_query.items():
-            entry = {"ok": False, "fetched_at": datetime.utcnow().isoformat(), "metrics": None, "message": None}
-            if not base_url:
-                entry["message"] = "no service url"
-                results[name] = entry
-                continue
-
-            metrics_url = f"{base_url.rstrip('/')}/metrics"
-            try:
-                resp = await client.get(metrics_url)
-                entry["ok"] = resp.status_code < 400
-                if resp.status_code < 400:
-                    entry["metrics"] = _parse_prometheus_metrics(resp.text, service_label=name)
-                else:
-                    entry["message"] = f"status {resp.status_code}"
-            except Exception as e:
-                entry["message"] = str(e)
+    client = _shared_client()
+    for name, base_url in services_to_query.items():
+        entry = {"ok": False, "fetched_at": datetime.datetime.utcnow().isoformat(), "metrics": None, "message": None}
+        if not base_url:
+            entry["message"] = "no service url"
             results[name] = entry
+            continue
+
+        metrics_url = f"{base_url.rstrip('/')}/metrics"
+        try:
+            resp = await client.get(metrics_url, timeout=5.0)
+            entry["ok"] = resp.status_code < 400
+            if resp.status_code < 400:
+                entry["metrics"] = _parse_prometheus_metrics(resp.text, service_label=name)
+            else:
+                entry["message"] = f"status {resp.status_code}"
+        except Exception as e:
+            entry["message"] = str(e)
+        results[name] = entry
 
-    return {"services": results, "generated_at": datetime.utcnow().isoformat()}
+    return {"services": results, "generated_at": datetime.datetime.utcnow().isoformat()}
 
 
 # Duplicate admin routes with /api prefix for compatibility with frontend
@@ -485,24 +569,38 @@ async def api_admin_metrics_summary(request: Request):
     return await admin_metrics_summary(request)
 
 
+# Headers that describe a single connection and must not be relayed
+_HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+})
+
+
 async def _proxy(request: Request, service: str, path: str):
-    service_url = SERVICE_URLS.get(service)
-    if not service_url:
+    service_base = SERVICE_BASE.get(service)
+    if not service_base:
         raise HTTPException(status_code=404, detail="Service not found")
 
-    url = f"{service_url}/{path}"
+    url = f"{service_base}/{path}"
     headers = dict(request.headers)
     # The Host header should be the service's host, not the gateway's
-    headers["host"] = service_url.split("://")[1].split(":")[0]
+    headers["host"] = SERVICE_HOSTS[service]
 
     # Remove content-length as we may be streaming
     headers.pop("content-length", None)
 
-    # Use persistent HTTP client with retries for reliability
-    global http_client
-    if not http_client:
-        raise HTTPException(status_code=503, detail="Gateway HTTP client not initialized")
+    # Use the upstream's persistent pool with retries for reliability
+    client = proxy_pools.get(SERVICE_ORIGINS[service]) or _shared_client()
     
+    has_body = "transfer-encoding" in request.headers or request.headers.get("content-length", "0") != "0"
+    body_started = False
+
+    async def _body_stream():
+        nonlocal body_started
+        body_started = True
+        async for chunk in request.stream():
+            yield chunk
+
     retries = 2
     backoff = 0.5
     last_exc = None
@@ -510,64 +608,58 @@ async def _proxy(request: Request, service: str, path: str):
     for attempt in range(1, retries + 1):
         start_ts = time.time()
         try:
-            # Check if this is a multipart/form-data request (file upload)
-            content_type = request.headers.get("content-type", "")
-
-            if "multipart/form-data" in content_type:
-                # For multipart, stream the body directly to preserve boundaries
-                req = http_client.build_request(
-                    request.method,
-                    url,
-                    headers=headers,
-                    params=request.query_params,
-                    content=request.stream()  # Stream instead of body()
-                )
-            else:
-                # For regular requests, use body
-                req = http_client.build_request(
-                    request.method,
-                    url,
-                    headers=headers,
-                    params=request.query_params,
-                    content=await request.body()
-                )
-            resp = await http_client.send(req, stream=True)
+            # Stream the request body through as it arrives rather than
+            # buffering it; bodyless requests are sent without content.
+            req = client.build_request(
+                request.method,
+                url,
+                headers=headers,
+                params=request.query_params,
+                content=_body_stream() if has_body else None
+            )
+            resp = await client.send(req, stream=True)
             elapsed = time.time() - start_ts
 
             # Log slow responses for ai_brain specifically
             if service == 'ai_brain' and elapsed > 3.0:
                 logger.warning(f"ai_brain slow response: {request.method} {path} took {elapsed:.2f}s (attempt {attempt})")
 
-            content_type = resp.headers.get("content-type", "application/json")
-            data = await resp.aread()
+            # Services answer JSON; one that omits the header is still JSON
+            content_type = resp.headers.get("content-type") or "application/json"
+            media_type = content_type.split(";", 1)[0].strip().lower()
 
-            # Handle binary responses (images, PDFs, etc.)
-            if content_type.startswith("image/") or content_type == "application/pdf":
-                from fastapi.responses import Response as FastAPIResponse
+            # JSON, text, images and PDFs are relayed byte-for-byte as they
+            # arrive; only unknown types are buffered and wrapped below
+            if (
+                media_type == "application/json" or media_type.endswith("+json")
+                or media_type.startswith(("text/", "image/")) or media_type == "application/pdf"
+            ):
                 logger.info(f"Proxy OK: {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
-                return FastAPIResponse(content=data, media_type=content_type, status_code=resp.status_code)
+                return StreamingResponse(
+                    resp.aiter_raw(),
+                    status_code=resp.status_code,
+                    headers={k: v for k, v in resp.headers.items() if k.lower() not in _HOP_BY_HOP_HEADERS},
+                    media_type=content_type,
+                    background=BackgroundTask(resp.aclose),
+                )
 
-            # Handle JSON responses
-            import json
+            data = await resp.aread()
+
+            # Unknown content type: wrap so the frontend always gets JSON
             try:
-                parsed = json.loads(data)
-                logger.info(f"Proxy OK: {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
-                return JSONResponse(content=parsed, status_code=resp.status_code)
-            except Exception:
-                try:
-                    text_content = data.decode('utf-8')
-                    logger.info(f"Proxy OK (text): {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
-                    return JSONResponse(content={"raw": text_content}, status_code=resp.status_code)
-                except UnicodeDecodeError:
-                    import base64
-                    logger.info(f"Proxy OK (binary): {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
-                    return JSONResponse(content={"raw_base64": base64.b64encode(data).decode()}, status_code=resp.status_code)
+                text_content = data.decode('utf-8')
+                logger.info(f"Proxy OK (text): {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
+                return JSONResponse(content={"raw": text_content}, status_code=resp.status_code)
+            except UnicodeDecodeError:
+                logger.info(f"Proxy OK (binary): {request.method} {url} -> {resp.status_code} in {elapsed:.2f}s")
+                return JSONResponse(content={"raw_base64": base64.b64encode(data).decode()}, status_code=resp.status_code)
 
         except httpx.RequestError as e:
             elapsed = time.time() - start_ts
             logger.error(f"Proxy request error to {service} {url} (attempt {attempt}/{retries}) after {elapsed:.2f}s: {e}")
             last_exc = e
-            if attempt < retries:
+            # A partially sent body stream cannot be replayed
+            if attempt < retries and not body_started:
                 await asyncio.sleep(backoff * attempt)
                 continue
             else:
@@ -640,8 +732,6 @@ if socketio:
 # ═══════════════════════════════════════════════════════════════════════════
 # Kubernetes Management Endpoints
 # ═══════════════════════════════════════════════════════════════════════════
-import subprocess
-import json
 
 @app.get("/k8s/pods")
 async def get_pods():
@@ -787,9 +877,9 @@ async def delete_pod(pod_name: str):
 async def get_observations(limit: int = 20):
     """Proxy GET /observations to kilo-ai-brain"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(f"http://kilo-ai-brain:9004/observations", params={"limit": limit})
-            return resp.json()
+        client = _shared_client()
+        resp = await client.get(f"http://kilo-ai-brain:9004/observations", params={"limit": limit}, timeout=10.0)
+        return orjson.loads(resp.content)
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
@@ -799,48 +889,59 @@ async def post_observation(request: Request):
     """Proxy POST /observations to kilo-ai-brain"""
     try:
         body = await request.body()
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.post(
-                "http://kilo-ai-brain:9004/observations",
-                content=body,
-                headers={"Content-Type": "application/json"}
-            )
-            return resp.json()
+        client = _shared_client()
+        resp = await client.post(
+            "http://kilo-ai-brain:9004/observations",
+            content=body,
+            headers={"Content-Type": "application/json"},
+            timeout=10.0
+        )
+        return orjson.loads(resp.content)
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
 
 
-# Dedicated /chat routes that forward to ai_brain preserving the full path
-@app.api_route("/chat/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_chat(request: Request, path: str):
-    return await _proxy(request, "ai_brain", f"chat/{path}")
+# Proxy dispatch: one dict lookup on the first path segment instead of
+# Starlette testing the catch-all route regexes in turn. Frontend can call
+# either /api/service or /service directly. Paths whose first segment is not
+# a known service (admin, k8s, socket.io, ...) fall through to the router.
+_PROXY_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
 
-@app.api_route("/api/chat/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_api_chat(request: Request, path: str):
-    return await _proxy(request, "ai_brain", f"chat/{path}")
+# Sub-paths forwarded with their prefix kept, e.g. /chat/x -> ai_brain /chat/x
+_PROXY_PREFIXED = {"chat": ("ai_brain", "chat/")}
 
-@app.api_route("/api/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_all_api(request: Request, service: str, path: str):
-    return await _proxy(request, service, path)
 
-@app.api_route("/api/{service}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_root_api(request: Request, service: str):
-    return await _proxy(request, service, "")
+def _resolve_proxy_target(path: str):
+    """Map a request path to (service, upstream_path), or None if not proxied."""
+    segment, sep, rest = path.lstrip("/").partition("/")
+    if segment == "api":
+        segment, sep, rest = rest.partition("/")
+    if sep and segment in _PROXY_PREFIXED:
+        service, prefix = _PROXY_PREFIXED[segment]
+        return service, f"{prefix}{rest}"
+    if segment in SERVICE_BASE:
+        return segment, rest
+    return None
 
-# NOTE: Catch-all routes enabled but exclude socket.io to allow WebSocket connections
-# Frontend can call either /api/service or /service directly
-@app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_all(request: Request, service: str, path: str):
-    # Don't proxy socket.io through this route - let it be handled separately
-    if service == "socket.io":
-        raise HTTPException(status_code=404, detail="Not found")
-    return await _proxy(request, service, path)
 
-@app.api_route("/{service}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_root(request: Request, service: str):
-    # Don't proxy socket.io through this route - let it be handled separately
-    if service == "socket.io":
-        raise HTTPException(status_code=404, detail="Not found")
-    return await _proxy(request, service, "")
+@app.middleware("http")
+async def proxy_dispatch(request: Request, call_next):
+    target = _resolve_proxy_target(request.url.path) if request.method in _PROXY_METHODS else None
+    if target is None:
+        return await call_next(request)
+    try:
+        return await _proxy(request, *target)
+    except HTTPException as e:
+        # Middleware runs outside FastAPI's exception handlers
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
 
 
+# Add CORS middleware to allow frontend access. Registered after the proxy
+# dispatcher so it wraps (and adds headers to) proxied responses too.
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allow all origins for local development
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
@@ -0,0 +1,111 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def gm(load_service, monkeypatch, tmp_path):
+    """services/gateway/main.py with an isolated token DB and no admin key."""
+    monkeypatch.delenv("LIBRARY_ADMIN_KEY", raising=False)
+    return load_service("gateway", GATEWAY_DB_URL=f"sqlite:///{tmp_path / 'gateway.db'}")
+
+
+class Upstream:
+    """MockTransport handler recording every request the gateway forwards."""
+
+    def __init__(self, fail_first=False, fail_always=False, content_type="application/json"):
+        self.requests = []
+        self.content_type = content_type
+        self.fail_first = fail_first
+        self.fail_always = fail_always
+
+    async def __call__(self, request: httpx.Request):
+        body = await request.aread()
+        self.requests.append((request.url.host, request.url.path, body))
+        if self.fail_always or (self.fail_first and len(self.requests) == 1):
+            raise httpx.ConnectError("upstream down", request=request)
+        # Unread stream, as from a real upstream, so the gateway can relay it
+        body = json.dumps({"host": request.url.host, "path": request.url.path}).encode()
+        headers = {"content-type": self.content_type} if self.content_type else {}
+        return httpx.Response(200, headers=headers, stream=httpx.ByteStream(body))
+
+
+def use_upstream(gm, upstream):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    gm.http_client = client
+    for origin in list(gm.proxy_pools):
+        gm.proxy_pools[origin] = client
+
+
+def test_resolve_proxy_target_aliases_and_prefixes(gm):
+    assert gm._resolve_proxy_target("/api/meds/due") == ("meds", "due")
+    assert gm._resolve_proxy_target("/reminders/") == ("reminders", "")
+    assert gm._resolve_proxy_target("/api/library/search") == ("library", "search")
+    # /chat/... keeps its prefix on ai_brain
+    assert gm._resolve_proxy_target("/chat/stream") == ("ai_brain", "chat/stream")
+    assert gm._resolve_proxy_target("/api/admin/status") is None
+    assert gm._resolve_proxy_target("/nosuch/x") is None
+
+
+def test_alias_path_is_proxied_to_canonical_service(gm):
+    upstream = Upstream()
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        r = client.get("/api/reminders/upcoming")
+        assert r.status_code == 200
+        assert r.json() == {"host": "kilo-reminder", "path": "/upcoming"}
+        r = client.get("/library/entries")
+        assert r.json() == {"host": "kilo-library", "path": "/entries"}
+
+
+def test_explicit_routes_are_not_shadowed(gm):
+    upstream = Upstream()
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        assert client.get("/health").status_code == 200
+        assert client.get("/status").json() == {"status": "ok"}
+        r = client.post("/admin/tokens")
+        assert r.status_code == 200 and "token" in r.json()
+        assert client.get("/api/admin/metrics/summary").status_code == 401
+    assert upstream.requests == []
+
+
+def test_unknown_service_prefix_falls_through_to_404(gm):
+    upstream = Upstream()
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        assert client.get("/nosuch/thing").status_code == 404
+        assert client.get("/api/nosuch").status_code == 404
+    assert upstream.requests == []
+
+
+def test_bodyless_request_is_retried(gm):
+    upstream = Upstream(fail_first=True)
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        r = client.get("/api/meds/due")
+    assert r.status_code == 200
+    assert len(upstream.requests) == 2
+
+
+def test_streamed_body_is_not_retried_once_sent(gm):
+    upstream = Upstream(fail_always=True)
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        r = client.post("/api/meds/add", content=b'{"name": "asp"}',
+                        headers={"content-type": "application/json"})
+    assert r.status_code == 502
+    # the body stream was consumed by the first attempt, so no replay
+    assert upstream.requests == [("kilo-meds", "/add", b'{"name": "asp"}')]
+
+
+def test_response_without_content_type_is_relayed_as_json(gm):
+    upstream = Upstream(content_type=None)
+    with TestClient(gm.app) as client:
+        use_upstream(gm, upstream)
+        r = client.get("/api/habits/")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert r.json() == {"host": "kilo-habits", "path": "/"}
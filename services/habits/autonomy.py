@@ -1,20 +1,30 @@
 import datetime
+from sqlalchemy import bindparam
 from sqlmodel import Session, select
 from shared.models import Habit, HabitCompletion
 
+# One LEFT OUTER JOIN against today's completions instead of a query per habit;
+# built once so SQLAlchemy's compiled-statement cache is hit on every call
+TODAY_STATUS_STMT = (
+    select(Habit, HabitCompletion)
+    .join(
+        HabitCompletion,
+        (HabitCompletion.habit_id == Habit.id) & (HabitCompletion.completion_date == bindparam("today")),
+        isouter=True,
+    )
+    .where(Habit.active == True)
+    .order_by(Habit.id, HabitCompletion.id)
+)
+
 def get_today_habit_status(engine):
     today = datetime.datetime.utcnow().date().isoformat()
     with Session(engine) as session:
-        habits = session.exec(select(Habit).where(Habit.active == True)).all()
         status = []
-        for h in habits:
-            completion = session.exec(
-                select(HabitCompletion).where(
-                    HabitCompletion.habit_id == h.id,
-                    HabitCompletion.completion_date == today
-                )
-            ).first()
-            
+        seen = set()
+        for h, completion in session.exec(TODAY_STATUS_STMT, params={"today": today}):
+            if h.id in seen:
+                continue
+            seen.add(h.id)
             status.append({
                 "habit": h.name,
                 "id": h.id,
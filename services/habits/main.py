@@ -3,43 +3,111 @@ import sys
 import asyncio
 import datetime
 import json
+import logging
+from collections import defaultdict
 from typing import Optional, List
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
-from sqlmodel import Session, select, create_engine
+from fastapi.responses import ORJSONResponse
+from sqlmodel import SQLModel, Session, select, create_engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import bindparam, delete, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import httpx
 
 # Add shared directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+from shared.db import enable_sqlite_wal
 from shared.models import Habit, HabitCompletion
-from shared.utils.persona import get_quip
+from shared.utils.persona import get_habits_done_quip, get_habits_pending_quip
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from kilo_integration import KiloNerve
 from autonomy import get_today_habit_status
 
 # Use shared database path from PVC
 db_url = os.getenv("DATABASE_URL", "sqlite:////app/kilo_data/kilo_guardian.db")
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
+engine = enable_sqlite_wal(create_engine(
+    db_url,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=5,
+))
 
-app = FastAPI(title="Kilo Habits Service - Gremlin Edition 😈")
+# Reused statements (compiled once by SQLAlchemy's statement cache)
+ALL_HABITS_STMT = select(Habit.__table__)
+COMPLETIONS_FOR_HABITS_STMT = (
+    select(HabitCompletion.__table__)
+    .where(HabitCompletion.__table__.c.habit_id.in_(bindparam("habit_ids", expanding=True)))
+    .order_by(HabitCompletion.__table__.c.id)
+)
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Kilo Habits Service - Gremlin Edition 😈", default_response_class=ORJSONResponse)
 
 # Initialize Kilo nerve
 kilo_nerve = KiloNerve("habits")
 
+
+@app.on_event("startup")
+def ensure_completion_index():
+    """Ensure one HabitCompletion row per habit per day, as complete_habit upserts on it.
+
+    Older databases may hold duplicate rows for a day; fold them into the
+    lowest id before creating the unique index. Runs once: skipped as soon
+    as the index exists.
+    """
+    SQLModel.metadata.create_all(engine, tables=[Habit.__table__, HabitCompletion.__table__])
+    with engine.begin() as conn:
+        if conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_habit_day'"
+        )).first():
+            return
+        conn.execute(text(
+            "UPDATE habitcompletion SET count = ("
+            " SELECT SUM(d.count) FROM habitcompletion d"
+            " WHERE d.habit_id = habitcompletion.habit_id"
+            " AND d.completion_date = habitcompletion.completion_date)"
+            " WHERE id IN (SELECT MIN(id) FROM habitcompletion"
+            " GROUP BY habit_id, completion_date HAVING COUNT(*) > 1)"
+        ))
+        merged = conn.execute(text(
+            "DELETE FROM habitcompletion WHERE id NOT IN ("
+            " SELECT MIN(id) FROM habitcompletion GROUP BY habit_id, completion_date)"
+        )).rowcount
+        conn.execute(text(
+            "CREATE UNIQUE INDEX uq_habit_day"
+            " ON habitcompletion (habit_id, completion_date)"
+        ))
+    logger.info(f"Created uq_habit_day; merged {merged} duplicate completion row(s)")
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
+
 @app.get("/health")
 def health():
     return {"status": "ok", "message": "I'm watching your progress... or lack of it! 😈"}
 
 @app.get("/")
 def list_habits():
+    # Plain Core rows: read-only listing doesn't need ORM instances
     with Session(engine) as session:
-        habits = session.exec(select(Habit)).all()
+        habits = session.execute(ALL_HABITS_STMT).mappings().all()
+        # Fetch every habit's completions in one IN query instead of one per habit
+        completions_by_habit = defaultdict(list)
+        if habits:
+            completions = session.execute(
+                COMPLETIONS_FOR_HABITS_STMT, {"habit_ids": [h["id"] for h in habits]}
+            ).mappings().all()
+            for c in completions:
+                completions_by_habit[c["habit_id"]].append(dict(c))
         result = []
         for h in habits:
-            completions = session.exec(select(HabitCompletion).where(HabitCompletion.habit_id == h.id)).all()
-            habit_dict = h.dict()
-            habit_dict["completions"] = [c.dict() for c in completions]
+            habit_dict = dict(h)
+            habit_dict["completions"] = completions_by_habit[h["id"]]
             result.append(habit_dict)
         return {
             "habits": result,
@@ -51,69 +119,81 @@ def list_today_status():
     """Autonomous status check for what is done/pending today with Gremlin flavor."""
     status = get_today_habit_status(engine)
     pending = [h for h in status if not h["is_done"]]
-    message = get_quip("habits_pending") if pending else get_quip("habits_done")
+    message = get_habits_pending_quip() if pending else get_habits_done_quip()
     return {
         "status": status,
         "gremlin_message": message
     }
 
-@app.post("/")
-async def add_habit(h: Habit):
+def _add_habit_sync(h: Habit) -> Habit:
     with Session(engine) as session:
         session.add(h)
         session.commit()
         session.refresh(h)
-        
-        # KILO INTEGRATION
-        await kilo_nerve.send_observation(f"Habit created: {h.name} ({h.frequency})", priority="normal")
-        
         return h
 
-@app.post("/complete/{habit_id}")
-async def complete_habit(habit_id: int):
+@app.post("/")
+async def add_habit(h: Habit):
+    # Blocking DB work runs in a worker thread so the event loop stays free
+    h = await asyncio.to_thread(_add_habit_sync, h)
+
+    # KILO INTEGRATION
+    await kilo_nerve.send_observation(f"Habit created: {h.name} ({h.frequency})", priority="normal")
+
+    return h
+
+def _complete_habit_sync(habit_id: int) -> dict:
     today = datetime.datetime.utcnow().date().isoformat()
     with Session(engine) as session:
         habit = session.get(Habit, habit_id)
         if not habit:
             raise HTTPException(status_code=404, detail="I lost that habit! It's gone! (Just kidding, it was never there). 😈")
         
-        existing = session.exec(
-            select(HabitCompletion).where(
-                HabitCompletion.habit_id == habit_id,
-                HabitCompletion.completion_date == today
+        # Atomic insert-or-increment of today's row (relies on uq_habit_day)
+        completions = HabitCompletion.__table__
+        stmt = (
+            sqlite_insert(completions)
+            .values(habit_id=habit_id, completion_date=today, count=1)
+            .on_conflict_do_update(
+                index_elements=["habit_id", "completion_date"],
+                set_={"count": completions.c.count + 1},
             )
-        ).first()
-        
-        if existing:
-            existing.count += 1
-            session.add(existing)
-            session.commit()
-            session.refresh(existing)
-            result = existing
-        else:
-            result = HabitCompletion(habit_id=habit_id, completion_date=today, count=1)
-            session.add(result)
-            session.commit()
-            session.refresh(result)
-        
+            .returning(*completions.c)
+        )
+        result = dict(session.execute(stmt).mappings().one())
+        session.commit()
+
         return {
             "completion": result,
             "gremlin_message": f"Did you really do {habit.name}? I'll take your word for it... for now. 😈"
         }
 
-@app.delete("/{habit_id}")
-async def delete_habit(habit_id: int):
-    """Delete a habit and its history. Poof! 🪄"""
+# habit_id -> in-flight completion, so a double-click counts once
+_inflight_completions: dict = {}
+
+@app.post("/complete/{habit_id}")
+async def complete_habit(habit_id: int):
+    task = _inflight_completions.get(habit_id)
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(_complete_habit_sync, habit_id))
+        _inflight_completions[habit_id] = task
+        task.add_done_callback(lambda _: _inflight_completions.pop(habit_id, None))
+    # Shielded: one caller disconnecting must not cancel the others' result
+    return await asyncio.shield(task)
+
+def _delete_habit_sync(habit_id: int) -> dict:
     with Session(engine) as session:
         habit = session.get(Habit, habit_id)
         if not habit:
             raise HTTPException(status_code=404, detail="That habit doesn't exist! Are you seeing things? 👻")
         
-        # Delete completions first
-        completions = session.exec(select(HabitCompletion).where(HabitCompletion.habit_id == habit_id)).all()
-        for c in completions:
-            session.delete(c)
-            
+        # Delete completions first, in one statement
+        session.execute(delete(HabitCompletion).where(HabitCompletion.habit_id == habit_id))
         session.delete(habit)
         session.commit()
-        return {"message": f"I've vaporized the '{habit.name}' habit and all its evidence! 💨"}
\ No newline at end of file
+        return {"message": f"I've vaporized the '{habit.name}' habit and all its evidence! 💨"}
+
+@app.delete("/{habit_id}")
+async def delete_habit(habit_id: int):
+    """Delete a habit and its history. Poof! 🪄"""
+    return await asyncio.to_thread(_delete_habit_sync, habit_id)
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine
+
+
+@pytest.fixture
+def hm(load_service, monkeypatch, tmp_path):
+    """services/habits/main.py against an isolated SQLite file."""
+    module = load_service("habits", DATABASE_URL=f"sqlite:///{tmp_path / 'habits.db'}")
+
+    # keep observations off the network
+    async def _no_observation(*args, **kwargs):
+        return True
+    monkeypatch.setattr(module.kilo_nerve, "send_observation", _no_observation)
+    return module
+
+
+def seed_duplicate_completions(db_path):
+    """Create a pre-upsert database: no uq_habit_day, duplicate rows per day."""
+    from shared.models import Habit, HabitCompletion
+    SQLModel.metadata.create_all(
+        create_engine(f"sqlite:///{db_path}"),
+        tables=[Habit.__table__, HabitCompletion.__table__],
+    )
+    conn = sqlite3.connect(db_path)
+    conn.execute("DROP INDEX uq_habit_day")
+    conn.execute("INSERT INTO habit (id, name, frequency, target_count, active, created_at)"
+                 " VALUES (1, 'walk', 'daily', 1, 1, '2024-01-01')")
+    conn.executemany(
+        "INSERT INTO habitcompletion (habit_id, completion_date, count) VALUES (?, ?, ?)",
+        [(1, "2024-01-01", 1), (1, "2024-01-01", 2), (1, "2024-01-02", 1), (1, "2024-01-01", 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_startup_merges_duplicate_completions_once(hm, tmp_path, caplog):
+    seed_duplicate_completions(tmp_path / "habits.db")
+
+    with caplog.at_level(logging.INFO, logger=hm.logger.name):
+        with TestClient(hm.app) as client:
+            completions = client.get("/").json()["habits"][0]["completions"]
+    assert [(c["completion_date"], c["count"]) for c in completions] == [
+        ("2024-01-01", 4),
+        ("2024-01-02", 1),
+    ]
+    assert "merged 2 duplicate completion row(s)" in caplog.text
+
+    # index now exists, so a restart doesn't touch the data again
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger=hm.logger.name):
+        with TestClient(hm.app) as client:
+            completions = client.get("/").json()["habits"][0]["completions"]
+    assert [(c["completion_date"], c["count"]) for c in completions] == [
+        ("2024-01-01", 4),
+        ("2024-01-02", 1),
+    ]
+    assert "merged" not in caplog.text
+
+
+def test_complete_upserts_one_row_per_day(hm):
+
+    with TestClient(hm.app) as client:
+        habit_id = client.post("/", json={"name": "stretch"}).json()["id"]
+        first = client.post(f"/complete/{habit_id}").json()["completion"]
+        second = client.post(f"/complete/{habit_id}").json()["completion"]
+        completions = client.get("/").json()["habits"][0]["completions"]
+
+    assert first["count"] == 1
+    assert second["id"] == first["id"]
+    assert second["count"] == 2
+    assert len(completions) == 1
+    assert completions[0]["count"] == 2
+    assert client.post("/complete/999").status_code == 404
+
+
+def test_concurrent_completions_share_one_write(hm, monkeypatch):
+    hm.ensure_completion_index()
+    habit_id = hm._add_habit_sync(hm.Habit(name="floss")).id
+
+    writes = []
+    complete_sync = hm._complete_habit_sync
+    monkeypatch.setattr(hm, "_complete_habit_sync", lambda i: writes.append(i) or complete_sync(i))
+
+    async def double_click():
+        return await asyncio.gather(hm.complete_habit(habit_id), hm.complete_habit(habit_id))
+
+    first, second = asyncio.run(double_click())
+    assert writes == [habit_id]
+    assert first is second
+    assert first["completion"]["count"] == 1
+    assert hm._inflight_completions == {}
+
+
+def test_failed_completion_clears_inflight_entry(hm):
+    hm.ensure_completion_index()
+
+    async def concurrent_missing():
+        return await asyncio.gather(
+            hm.complete_habit(42), hm.complete_habit(42), return_exceptions=True
+        )
+
+    results = asyncio.run(concurrent_missing())
+    assert [r.status_code for r in results] == [404, 404]
+    assert all(isinstance(r, HTTPException) for r in results)
+    assert hm._inflight_completions == {}
+
+    # a later call starts fresh rather than reusing the failed task
+    with pytest.raises(HTTPException):
+        asyncio.run(hm.complete_habit(42))
+    assert hm._inflight_completions == {}
+
+
+def test_cancelled_caller_does_not_cancel_coalesced_completion(hm, monkeypatch):
+    hm.ensure_completion_index()
+    habit_id = hm._add_habit_sync(hm.Habit(name="water")).id
+
+    gate = threading.Event()
+    writes = []
+    complete_sync = hm._complete_habit_sync
+
+    def slow_complete(i):
+        gate.wait(5)
+        writes.append(i)
+        return complete_sync(i)
+    monkeypatch.setattr(hm, "_complete_habit_sync", slow_complete)
+
+    async def first_caller_disconnects():
+        first = asyncio.create_task(hm.complete_habit(habit_id))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hm.complete_habit(habit_id))
+        await asyncio.sleep(0)
+        first.cancel()  # what Starlette does when the client goes away
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    result = asyncio.run(first_caller_disconnects())
+    assert result["completion"]["count"] == 1
+    assert writes == [habit_id]
+    assert hm._inflight_completions == {}
@@ -1,11 +1,13 @@
 from fastapi import FastAPI
 import httpx
 import asyncio
+import json
 import logging
-import ssl
 import os
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 app = FastAPI(title="Kilo Health Monitor")
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +21,10 @@ TOKEN_FILE = '/var/run/secrets/kubernetes.io/serviceaccount/token'
 CA_FILE = '/var/run/secrets/kubernetes.io/serviceaccount/ca.crt'
 K8S_API = 'https://kubernetes.default.svc'
 
+# key -> time.monotonic() of the last alert/restart; swept by _gc_cooldowns
 alert_cooldown: dict = {}
 restart_cooldown: dict = {}
+COOLDOWN_MAX_AGE = 3600  # longer than any cooldown window in use
 
 SERVICES = {
     'ai_brain':  'http://kilo-ai-brain:9004/health',
@@ -36,6 +40,17 @@ SERVICES = {
 
 service_status: dict = {}
 
+# Full poll is a safety net; pod watch events trigger rechecks in between
+POLL_INTERVAL = 300
+RECHECK_DEBOUNCE = 5
+recheck_event: Optional[asyncio.Event] = None
+
+# Long-lived clients reused across loop cycles (created on startup)
+probe_client: Optional[httpx.AsyncClient] = None
+notify_client: Optional[httpx.AsyncClient] = None
+k8s_client: Optional[httpx.AsyncClient] = None
+_k8s_token_mtime: Optional[float] = None
+
 
 def _get_token() -> str:
     try:
@@ -45,51 +60,69 @@ def _get_token() -> str:
 
 
 def _k8s_client() -> httpx.AsyncClient:
-    token = _get_token()
-    ctx = ssl.create_default_context(cafile=CA_FILE) if Path(CA_FILE).exists() else ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    return httpx.AsyncClient(
-        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'},
-        verify=False,
-        timeout=10.0
-    )
+    """Return the shared k8s API client, re-reading the token only when it rotates."""
+    global k8s_client, _k8s_token_mtime
+    if k8s_client is None:
+        k8s_client = httpx.AsyncClient(
+            headers={'Content-Type': 'application/json'},
+            verify=False,
+            timeout=10.0
+        )
+    try:
+        mtime = os.stat(TOKEN_FILE).st_mtime
+    except OSError:
+        mtime = None
+    if mtime != _k8s_token_mtime or 'Authorization' not in k8s_client.headers:
+        k8s_client.headers['Authorization'] = f'Bearer {_get_token()}'
+        _k8s_token_mtime = mtime
+    return k8s_client
 
 
 def _cooldown_ok(key: str, seconds: int = 300) -> bool:
+    now = time.monotonic()
     last = alert_cooldown.get(key)
-    if last and (datetime.now() - last).total_seconds() < seconds:
+    if last is not None and now - last < seconds:
         return False
-    alert_cooldown[key] = datetime.now()
+    alert_cooldown[key] = now
     return True
 
 
 def _restart_ok(pod_name: str) -> bool:
+    now = time.monotonic()
     last = restart_cooldown.get(pod_name)
-    if last and (datetime.now() - last).total_seconds() < 600:
+    if last is not None and now - last < 600:
         return False
-    restart_cooldown[pod_name] = datetime.now()
+    restart_cooldown[pod_name] = now
     return True
 
 
+async def _gc_cooldowns():
+    """Drop expired cooldown entries so the dicts don't grow with pod churn."""
+    while True:
+        await asyncio.sleep(300)
+        now = time.monotonic()
+        for cooldowns in (alert_cooldown, restart_cooldown):
+            for key, last in list(cooldowns.items()):
+                if now - last > COOLDOWN_MAX_AGE:
+                    del cooldowns[key]
+
+
 async def notify_kilo(content: str, priority: str = 'high'):
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            await client.post(
-                f'{AI_BRAIN_URL}/observations',
-                json={'source': 'health_monitor', 'type': 'system_alert', 'content': content,
-                      'priority': priority, 'metadata': {'auto': True}}
-            )
+        await notify_client.post(
+            f'{AI_BRAIN_URL}/observations',
+            json={'source': 'health_monitor', 'type': 'system_alert', 'content': content,
+                  'priority': priority, 'metadata': {'auto': True}}
+        )
     except Exception as e:
         logger.error(f"notify_kilo failed: {e}")
 
 
 async def k8s_get_pods() -> list:
     try:
-        async with _k8s_client() as client:
-            r = await client.get(f'{K8S_API}/api/v1/namespaces/{NAMESPACE}/pods')
-            if r.status_code == 200:
-                return r.json().get('items', [])
+        r = await _k8s_client().get(f'{K8S_API}/api/v1/namespaces/{NAMESPACE}/pods')
+        if r.status_code == 200:
+            return r.json().get('items', [])
     except Exception as e:
         logger.error(f"k8s_get_pods failed: {e}")
     return []
@@ -97,20 +130,22 @@ async def k8s_get_pods() -> list:
 
 async def k8s_delete_pod(pod_name: str) -> bool:
     try:
-        async with _k8s_client() as client:
-            r = await client.delete(
-                f'{K8S_API}/api/v1/namespaces/{NAMESPACE}/pods/{pod_name}',
-                params={'gracePeriodSeconds': '0'}
-            )
-            return r.status_code in (200, 202)
+        r = await _k8s_client().delete(
+            f'{K8S_API}/api/v1/namespaces/{NAMESPACE}/pods/{pod_name}',
+            params={'gracePeriodSeconds': '0'}
+        )
+        return r.status_code in (200, 202)
     except Exception as e:
         logger.error(f"k8s_delete_pod {pod_name} failed: {e}")
         return False
 
 
-async def check_pod_health() -> list:
-    pods = await k8s_get_pods()
+async def check_pod_health(pods: Optional[list] = None) -> list:
+    """Check the given pods (e.g. from a watch event), or every pod in the namespace."""
+    if pods is None:
+        pods = await k8s_get_pods()
     issues = []
+    to_restart = []
     for pod in pods:
         name = pod['metadata']['name']
         phase = pod.get('status', {}).get('phase', '')
@@ -120,41 +155,87 @@ async def check_pod_health() -> list:
             if reason == 'CrashLoopBackOff':
                 issues.append(f"{name} CrashLoopBackOff")
                 if _restart_ok(name):
-                    ok = await k8s_delete_pod(name)
-                    action = "restarted" if ok else "restart FAILED"
-                    msg = f"🔧 SELF-HEAL: {name} was CrashLoopBackOff — {action}"
-                    logger.warning(msg)
-                    await notify_kilo(msg, 'high')
+                    to_restart.append(name)
             elif restarts > 5 and _cooldown_ok(f"{name}_restarts", 1800):
                 issues.append(f"{name} {restarts} restarts")
                 await notify_kilo(f"⚠️ {name} has restarted {restarts} times", 'normal')
         if phase == 'Pending' and _cooldown_ok(f"{name}_pending", 600):
             issues.append(f"{name} stuck Pending")
             await notify_kilo(f"⚠️ {name} stuck in Pending state", 'high')
+
+    # Independent pod deletes, so issue them concurrently
+    results = await asyncio.gather(*(k8s_delete_pod(name) for name in to_restart))
+    for name, ok in zip(to_restart, results):
+        action = "restarted" if ok else "restart FAILED"
+        msg = f"🔧 SELF-HEAL: {name} was CrashLoopBackOff — {action}"
+        logger.warning(msg)
+        await notify_kilo(msg, 'high')
     return issues
 
 
 async def check_service_endpoints() -> list:
     unhealthy = []
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        for name, url in SERVICES.items():
-            try:
-                r = await client.get(url)
-                if r.status_code == 200:
-                    service_status[name] = 'healthy'
-                else:
-                    service_status[name] = f'http_{r.status_code}'
-                    if _cooldown_ok(f"{name}_http"):
-                        unhealthy.append(f"{name} HTTP {r.status_code}")
-            except Exception as e:
-                service_status[name] = 'unreachable'
-                if _cooldown_ok(f"{name}_down"):
-                    unhealthy.append(f"{name} unreachable")
+    # Probe all services concurrently; a cycle takes as long as the slowest one
+    responses = await asyncio.gather(
+        *(probe_client.get(url) for url in SERVICES.values()),
+        return_exceptions=True
+    )
+    for name, r in zip(SERVICES, responses):
+        if isinstance(r, Exception):
+            service_status[name] = 'unreachable'
+            if _cooldown_ok(f"{name}_down"):
+                unhealthy.append(f"{name} unreachable")
+        elif r.status_code == 200:
+            service_status[name] = 'healthy'
+        else:
+            service_status[name] = f'http_{r.status_code}'
+            if _cooldown_ok(f"{name}_http"):
+                unhealthy.append(f"{name} HTTP {r.status_code}")
     return unhealthy
 
 
+async def pod_watch_loop():
+    """Stream pod events from the k8s API and react to changes as they happen."""
+    backoff = 1
+    resource_version = None
+    while True:
+        try:
+            params = {'watch': 'true'}
+            if resource_version:
+                params['resourceVersion'] = resource_version
+            async with _k8s_client().stream(
+                'GET', f'{K8S_API}/api/v1/namespaces/{NAMESPACE}/pods',
+                params=params, timeout=httpx.Timeout(10.0, read=None)
+            ) as r:
+                if r.status_code != 200:
+                    raise RuntimeError(f"watch HTTP {r.status_code}")
+                backoff = 1
+                async for line in r.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    etype = event.get('type')
+                    pod = event.get('object', {})
+                    if etype == 'ERROR':
+                        # Usually 410 Gone: resourceVersion too old, start over
+                        resource_version = None
+                        break
+                    resource_version = pod.get('metadata', {}).get('resourceVersion', resource_version)
+                    if etype == 'MODIFIED':
+                        await check_pod_health([pod])
+                        recheck_event.set()
+                    elif etype == 'DELETED':
+                        recheck_event.set()
+            # Server closed the watch (normal after its timeout); reconnect
+            await asyncio.sleep(1)
+        except Exception as e:
+            logger.error(f"pod watch failed: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
 async def health_check_loop():
-    logger.info("🔍 Kilo Health Monitor v2 — checking every 60s")
+    logger.info(f"🔍 Kilo Health Monitor v2 — pod watch + full check every {POLL_INTERVAL}s")
     cycle = 0
     while True:
         try:
@@ -176,12 +257,33 @@ async def health_check_loop():
                 logger.info(f"✅ Cycle {cycle}: {healthy}/{len(service_status)} healthy")
         except Exception as e:
             logger.error(f"Loop error: {e}")
-        await asyncio.sleep(60)
+        # Sleep until the safety-net interval or a pod change, whichever is first
+        try:
+            await asyncio.wait_for(recheck_event.wait(), POLL_INTERVAL)
+            # Let a burst of pod events settle into one recheck
+            await asyncio.sleep(RECHECK_DEBOUNCE)
+        except asyncio.TimeoutError:
+            pass
+        recheck_event.clear()
 
 
 @app.on_event("startup")
 async def startup_event():
+    global probe_client, notify_client, recheck_event
+    recheck_event = asyncio.Event()
+    probe_client = httpx.AsyncClient(timeout=5.0, limits=httpx.Limits(max_keepalive_connections=20))
+    notify_client = httpx.AsyncClient(timeout=5.0)
+    _k8s_client()
     asyncio.create_task(health_check_loop())
+    asyncio.create_task(pod_watch_loop())
+    asyncio.create_task(_gc_cooldowns())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for client in (probe_client, notify_client, k8s_client):
+        if client:
+            await client.aclose()
 
 
 @app.get("/health")
@@ -2,6 +2,7 @@
 Kilo Integration Module
 Add this to each microservice to connect it to Kilo's nervous system.
 """
+import asyncio
 import httpx
 import os
 import logging
@@ -15,6 +16,10 @@ AI_BRAIN_URL = os.getenv("AI_BRAIN_URL", "http://kilo-ai-brain:9004")
 SOCKETIO_URL = os.getenv("SOCKETIO_URL", "http://kilo-socketio:9010")
 GATEWAY_URL = os.getenv("GATEWAY_URL", "http://kilo-gateway:8000")
 
+# Observation batching: flush after this many items or this many seconds
+OBSERVATION_BATCH_SIZE = 50
+OBSERVATION_BATCH_WINDOW = 0.1
+
 class KiloNerve:
     """
     Connects a microservice to Kilo's nervous system.
@@ -23,6 +28,9 @@ class KiloNerve:
 
     def __init__(self, service_name: str):
         self.service_name = service_name
+        self._obs_queue: Optional[asyncio.Queue] = None
+        self._obs_task: Optional[asyncio.Task] = None
+        self._obs_client: Optional[httpx.AsyncClient] = None
 
     async def send_observation(
         self,
@@ -33,10 +41,17 @@ class KiloNerve:
         """
         Send an observation to Kilo's AI Brain.
 
+        The observation is queued and returns immediately; a background task
+        drains the queue and delivers observations in batches.
+
         Args:
             content: What happened (e.g., "User took Vitamin D")
             priority: "low", "normal", "high", "urgent"
             metadata: Additional context data
+
+        Returns:
+            True once queued, False if it could not be queued. Delivery
+            happens later, so a failed POST is logged rather than returned.
         """
         try:
             observation = {
@@ -47,20 +62,85 @@ class KiloNerve:
                 "timestamp": datetime.now().isoformat()
             }
 
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                resp = await client.post(
+            if self._obs_queue is None:
+                self._obs_queue = asyncio.Queue()
+            if self._obs_task is None or self._obs_task.done():
+                self._obs_task = asyncio.create_task(self._drain_observations())
+            self._obs_queue.put_nowait(observation)
+            return True
+        except Exception as e:
+            logger.error(f"[{self.service_name}] Error queueing observation: {e}")
+            return False
+
+    async def _drain_observations(self):
+        """Pull queued observations and POST them to ai_brain in batches."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._obs_queue.get()]
+            deadline = loop.time() + OBSERVATION_BATCH_WINDOW
+            while len(batch) < OBSERVATION_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._obs_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._post_observations(batch)
+            for _ in batch:
+                self._obs_queue.task_done()
+
+    async def _post_observations(self, batch: list):
+        try:
+            if self._obs_client is None:
+                self._obs_client = httpx.AsyncClient(timeout=5.0)
+            resp = await self._obs_client.post(
+                f"{AI_BRAIN_URL}/observations/batch",
+                json={"batch": batch}
+            )
+        except Exception as e:
+            logger.error(f"[{self.service_name}] Error sending observations: {e}")
+            return
+        if resp.status_code not in (404, 405):
+            if resp.status_code == 200:
+                logger.info(f"[{self.service_name}] {len(batch)} observation(s) sent to Kilo")
+            else:
+                logger.warning(f"[{self.service_name}] Failed to send observations: {resp.status_code}")
+            return
+
+        # Older ai_brain without the batch endpoint: one POST each, and one
+        # failure doesn't stop the rest
+        failures = []
+        for observation in batch:
+            try:
+                resp = await self._obs_client.post(
                     f"{AI_BRAIN_URL}/observations",
                     json=observation
                 )
-                if resp.status_code == 200:
-                    logger.info(f"[{self.service_name}] Observation sent to Kilo: {content[:50]}")
-                    return True
-                else:
-                    logger.warning(f"[{self.service_name}] Failed to send observation: {resp.status_code}")
-                    return False
-        except Exception as e:
-            logger.error(f"[{self.service_name}] Error sending observation: {e}")
-            return False
+                if resp.status_code != 200:
+                    failures.append(resp.status_code)
+            except Exception as e:
+                failures.append(e)
+        sent = len(batch) - len(failures)
+        if sent:
+            logger.info(f"[{self.service_name}] {sent} observation(s) sent to Kilo")
+        if failures:
+            logger.warning(
+                f"[{self.service_name}] Failed to send {len(failures)} of {len(batch)} "
+                f"observation(s): {failures[-1]}"
+            )
+
+    async def aclose(self):
+        """Flush queued observations and close the HTTP client (call on shutdown)."""
+        if self._obs_task is not None and not self._obs_task.done():
+            try:
+                await asyncio.wait_for(self._obs_queue.join(), 5.0)
+            except asyncio.TimeoutError:
+                logger.warning(f"[{self.service_name}] Dropping {self._obs_queue.qsize()} unsent observation(s)")
+            self._obs_task.cancel()
+        if self._obs_client is not None:
+            await self._obs_client.aclose()
+            self._obs_client = None
 
     async def emit_event(
         self,
@@ -59,6 +59,8 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[Library of Truth] Startup error: {e}")
     yield
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
 
 
 kilo_nerve = KiloNerve("library")
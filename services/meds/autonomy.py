@@ -1,25 +1,21 @@
 import datetime
-from sqlmodel import Session, select
+from sqlalchemy import bindparam
+from sqlmodel import Session, select, or_
 from shared.models import Med
 
+# Built once so SQLAlchemy's compiled-statement cache is hit on every call.
+# Simple daily logic: due unless last taken today. last_taken is an ISO
+# string, so comparing against today's date sorts correctly in SQL.
+DUE_MEDS_STMT = (
+    select(Med)
+    .where(or_(Med.last_taken.is_(None), Med.last_taken < bindparam("today")))
+    .order_by(Med.id)
+)
+
 def get_due_meds(engine):
+    today = datetime.datetime.utcnow().date().isoformat()
     with Session(engine) as session:
-        meds = session.exec(select(Med)).all()
-        due = []
-        now = datetime.datetime.utcnow()
-        for med in meds:
-            if not med.last_taken:
-                due.append(med)
-                continue
-            
-            try:
-                last_taken = datetime.datetime.fromisoformat(med.last_taken)
-                # Simple daily logic: if last taken is not today
-                if last_taken.date() < now.date():
-                    due.append(med)
-            except ValueError:
-                due.append(med)
-        return due
+        return session.exec(DUE_MEDS_STMT, params={"today": today}).all()
 
 def record_taken(engine, med_id: int):
     with Session(engine) as session:
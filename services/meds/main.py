@@ -8,19 +8,22 @@ from pathlib import Path
 from typing import Optional, List
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import Response
+from fastapi.responses import ORJSONResponse, Response
 from PIL import Image
 from io import BytesIO
 import httpx
-from sqlmodel import Session, select, create_engine
+from sqlmodel import SQLModel, Session, select, create_engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy import text
 from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
 # Add shared directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
+from shared.db import enable_sqlite_wal
 from shared.models import Med, OcrJob
 from shared.utils.ocr import preprocess_image_for_ocr, parse_frequency, parse_times
-from shared.utils.persona import get_quip
+from shared.utils.persona import get_meds_due_quip, get_meds_taken_quip
 from autonomy import get_due_meds, record_taken
 
 # KILO INTEGRATION - Wire this service to Kilo's brain!
@@ -29,11 +32,19 @@ from kilo_integration import KiloNerve
 
 # Use shared database path from PVC
 db_url = os.getenv("DATABASE_URL", "sqlite:////app/kilo_data/kilo_guardian.db")
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
+engine = enable_sqlite_wal(create_engine(
+    db_url,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=5,
+))
+
+# Reused statements (compiled once by SQLAlchemy's statement cache)
+ALL_MEDS_STMT = select(Med.__table__)
 
 IMAGE_STORAGE_DIR = Path("/app/kilo_data/prescription_images")
 
-app = FastAPI(title="Kilo Meds Service - Gremlin Edition 😈")
+app = FastAPI(title="Kilo Meds Service - Gremlin Edition 😈", default_response_class=ORJSONResponse)
 
 # Initialize Kilo nerve
 kilo_nerve = KiloNerve("meds")
@@ -41,21 +52,32 @@ kilo_nerve = KiloNerve("meds")
 @app.on_event("startup")
 async def startup():
     IMAGE_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    # Index backing the last_taken filter in get_due_meds (no-op once present)
+    SQLModel.metadata.create_all(engine, tables=[Med.__table__])
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_med_last_taken ON med (last_taken)"))
     # Tell Kilo we're online
     await kilo_nerve.send_observation(
         content="Meds service online and ready to track pills! 💊",
         priority="low"
     )
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
+
 @app.get("/health")
 def health():
     return {"status": "ok", "message": "I'm alive and lurking! 😈"}
 
 @app.get("/")
 def list_meds():
+    # Plain Core rows: read-only listing doesn't need ORM instances
     with Session(engine) as session:
+        rows = session.execute(ALL_MEDS_STMT).mappings().all()
         return {
-            "meds": session.exec(select(Med)).all(),
+            "meds": [dict(r) for r in rows],
             "gremlin_message": "I've counted every single pill. Don't try to hide them! 💊"
         }
 
@@ -63,17 +85,29 @@ def list_meds():
 def list_due_meds():
     """Autonomous endpoint to check what is due NOW with Gremlin flavor."""
     due = get_due_meds(engine)
-    message = get_quip("meds_due") if due else "Everything is taken! How boringly responsible of you. 🙄"
+    message = get_meds_due_quip() if due else "Everything is taken! How boringly responsible of you. 🙄"
     return {
         "due": due,
         "count": len(due),
         "gremlin_message": message
     }
 
+# med_id -> in-flight take, so concurrent duplicate requests share one result
+_inflight_takes: dict = {}
+
 @app.post("/take/{med_id}")
 async def take_med(med_id: int):
     """Mark a medication as taken and update local state."""
-    med = record_taken(engine, med_id)
+    task = _inflight_takes.get(med_id)
+    if task is None:
+        task = asyncio.create_task(_take_med(med_id))
+        _inflight_takes[med_id] = task
+        task.add_done_callback(lambda _: _inflight_takes.pop(med_id, None))
+    # Shielded: one caller disconnecting must not cancel the others' result
+    return await asyncio.shield(task)
+
+async def _take_med(med_id: int):
+    med = await asyncio.to_thread(record_taken, engine, med_id)
     if not med:
         raise HTTPException(status_code=404, detail="I couldn't find that bottle! Did you eat it? 🧐")
     
@@ -101,46 +135,49 @@ async def take_med(med_id: int):
     
     return {
         "med": med,
-        "gremlin_message": get_quip("meds_taken")
+        "gremlin_message": get_meds_taken_quip()
     }
 
-@app.post("/add")
-async def add_med(med: Med):
+def _add_med_sync(med: Med) -> Med:
     with Session(engine) as session:
         session.add(med)
         session.commit()
         session.refresh(med)
-        
-        # KILO INTEGRATION - New med added!
-        await kilo_nerve.send_observation(
-            content=f"New medication added: {med.name} ({med.dosage}) - {med.schedule}",
-            priority="normal",
-            metadata={
-                "med_id": med.id,
-                "med_name": med.name,
-                "dosage": med.dosage,
-                "frequency": med.schedule,
-                "times": med.times
-            }
-        )
-        
-        await kilo_nerve.emit_event(
-            "med_added",
-            {
-                "med_name": med.name,
-                "dosage": med.dosage,
-                "frequency": med.schedule
-            }
-        )
-        
-        return {
-            "med": med,
-            "gremlin_message": f"Added {med.name}. More chores for you, more data for ME! 😈"
+        return med
+
+@app.post("/add")
+async def add_med(med: Med):
+    # Blocking DB work runs in a worker thread so the event loop stays free
+    med = await asyncio.to_thread(_add_med_sync, med)
+
+    # KILO INTEGRATION - New med added!
+    await kilo_nerve.send_observation(
+        content=f"New medication added: {med.name} ({med.dosage}) - {med.schedule}",
+        priority="normal",
+        metadata={
+            "med_id": med.id,
+            "med_name": med.name,
+            "dosage": med.dosage,
+            "frequency": med.schedule,
+            "times": med.times
+        }
+    )
+    
+    await kilo_nerve.emit_event(
+        "med_added",
+        {
+            "med_name": med.name,
+            "dosage": med.dosage,
+            "frequency": med.schedule
         }
+    )
+    
+    return {
+        "med": med,
+        "gremlin_message": f"Added {med.name}. More chores for you, more data for ME! 😈"
+    }
 
-@app.delete("/{med_id}")
-async def delete_med(med_id: int):
-    """Delete a medication by ID. Kilo likes deleting things! 😈"""
+def _delete_med_sync(med_id: int) -> str:
     with Session(engine) as session:
         med = session.get(Med, med_id)
         if not med:
@@ -149,12 +186,18 @@ async def delete_med(med_id: int):
         med_name = med.name
         session.delete(med)
         session.commit()
-        
-        # KILO INTEGRATION - Med deleted!
-        await kilo_nerve.alert_kilo(
-            alert_type="health",
-            message=f"Medication deleted: {med_name}",
-            severity="info"
-        )
-        
-        return {"message": f"Hehehe! {med_name} has been erased from existence! 💥"}
+        return med_name
+
+@app.delete("/{med_id}")
+async def delete_med(med_id: int):
+    """Delete a medication by ID. Kilo likes deleting things! 😈"""
+    med_name = await asyncio.to_thread(_delete_med_sync, med_id)
+
+    # KILO INTEGRATION - Med deleted!
+    await kilo_nerve.alert_kilo(
+        alert_type="health",
+        message=f"Medication deleted: {med_name}",
+        severity="info"
+    )
+    
+    return {"message": f"Hehehe! {med_name} has been erased from existence! 💥"}
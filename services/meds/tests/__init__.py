@@ -0,0 +1 @@
+# package marker for meds tests
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel
+
+
+@pytest.fixture
+def mm(load_service, monkeypatch, tmp_path):
+    """services/meds/main.py against an isolated SQLite file."""
+    pytest.importorskip("cv2")  # OCR helpers are imported at module load
+    module = load_service("meds", DATABASE_URL=f"sqlite:///{tmp_path / 'meds.db'}")
+    SQLModel.metadata.create_all(module.engine, tables=[module.Med.__table__])
+
+    # keep observations and events off the network
+    async def _quiet(*args, **kwargs):
+        return True
+    monkeypatch.setattr(module.kilo_nerve, "send_observation", _quiet)
+    monkeypatch.setattr(module.kilo_nerve, "emit_event", _quiet)
+    return module
+
+
+def test_concurrent_takes_record_one_dose(mm, monkeypatch):
+    med_id = mm._add_med_sync(mm.Med(name="asp", schedule="daily", dosage="81mg")).id
+
+    writes = []
+    record_taken = mm.record_taken
+    monkeypatch.setattr(mm, "record_taken", lambda engine, i: writes.append(i) or record_taken(engine, i))
+
+    async def double_tap():
+        return await asyncio.gather(mm.take_med(med_id), mm.take_med(med_id))
+
+    first, second = asyncio.run(double_tap())
+    assert writes == [med_id]
+    assert first is second
+    with Session(mm.engine) as session:
+        assert session.get(mm.Med, med_id).taken_count == 1
+    assert mm._inflight_takes == {}
+
+
+def test_failed_take_clears_inflight_entry(mm):
+    async def concurrent_missing():
+        return await asyncio.gather(mm.take_med(7), mm.take_med(7), return_exceptions=True)
+
+    results = asyncio.run(concurrent_missing())
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+    assert mm._inflight_takes == {}
+
+    # a later call starts fresh rather than reusing the failed task
+    with pytest.raises(HTTPException):
+        asyncio.run(mm.take_med(7))
+    assert mm._inflight_takes == {}
+
+
+def test_cancelled_caller_does_not_cancel_coalesced_take(mm, monkeypatch):
+    med_id = mm._add_med_sync(mm.Med(name="vit d", schedule="daily", dosage="1000IU")).id
+
+    gate = threading.Event()
+    record_taken = mm.record_taken
+
+    def slow_record(engine, i):
+        gate.wait(5)
+        return record_taken(engine, i)
+    monkeypatch.setattr(mm, "record_taken", slow_record)
+
+    async def first_caller_disconnects():
+        first = asyncio.create_task(mm.take_med(med_id))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(mm.take_med(med_id))
+        await asyncio.sleep(0)
+        first.cancel()  # what Starlette does when the client goes away
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    result = asyncio.run(first_caller_disconnects())
+    assert result["med"].taken_count == 1
+    with Session(mm.engine) as session:
+        assert session.get(mm.Med, med_id).taken_count == 1
+    assert mm._inflight_takes == {}
@@ -13,18 +13,25 @@ Provides:
 - /health, /status
 """
 
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, Request
+from fastapi.responses import ORJSONResponse, Response
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import httpx
 import asyncio
-import json
+import orjson
+import hashlib
 import sqlite3
+import threading
 import os
 import logging
+import calendar
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
-from collections import defaultdict
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,38 +47,79 @@ AI_BRAIN_URL = os.environ.get("AI_BRAIN_URL", "http://kilo-ai-brain:9004")
 HABITS_URL = os.environ.get("HABITS_URL", "http://kilo-habits:9000")
 MEDS_URL = os.environ.get("MEDS_URL", "http://kilo-meds:9000")
 FINANCIAL_URL = os.environ.get("FINANCIAL_URL", "http://kilo-financial:9005")
+# Read habit completions straight from the shared DB instead of via kilo-habits
+USE_DIRECT_DB = os.environ.get("USE_DIRECT_DB", "").lower() in ("1", "true", "yes")
 
 # In-memory pattern cache (refreshed on /learn)
 pattern_cache: Dict = {}
 last_trained: Optional[str] = None
+# habit_id -> best day, derived from pattern_cache for predict_habit (not persisted)
+best_day_by_habit: Dict[int, str] = {}
+# /insights body and ETag, serialized once per learning run
+_insights_body: Optional[bytes] = None
+_insights_etag: Optional[str] = None
 
+# Shared client for upstream fetches and notifications (created on startup)
+http_client: Optional[httpx.AsyncClient] = None
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Initial learning run shortly after startup, then nightly around 2am
+scheduler = AsyncIOScheduler()
+
+
+# One process-wide connection, opened on first use; hold _db_lock around writes.
+# Callers must not close it.
+_db_conn: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> sqlite3.Connection:
+    global _db_conn
+    with _db_lock:
+        if _db_conn is None:
+            # Shared DB file: WAL so reads don't block behind other services' writes
+            conn = sqlite3.connect(DB_PATH, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            _db_conn = conn
+    return _db_conn
 
 
 async def notify_kilo(content: str):
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            await client.post(f"{AI_BRAIN_URL}/observations", json={
-                "source": "ml_engine",
-                "type": "pattern_insight",
-                "content": content,
-                "priority": "normal",
-                "metadata": {"auto": True}
-            })
+        await http_client.post(f"{AI_BRAIN_URL}/observations", json={
+            "source": "ml_engine",
+            "type": "pattern_insight",
+            "content": content,
+            "priority": "normal",
+            "metadata": {"auto": True}
+        }, timeout=5.0)
     except Exception as e:
         logger.error(f"notify_kilo failed: {e}")
 
 
 # -- PATTERN ANALYSIS ────────────────────────────────────────────────────────
 
+def _to_days(date_strings: list) -> np.ndarray:
+    """Convert ISO date prefixes to a datetime64[D] array, dropping unparseable ones."""
+    try:
+        return np.array(date_strings, dtype="datetime64[D]")
+    except ValueError:
+        days = []
+        for ds in date_strings:
+            try:
+                days.append(np.datetime64(ds, "D"))
+            except ValueError:
+                pass
+        return np.array(days, dtype="datetime64[D]")
+
+
 def analyze_habit_patterns(habits: list) -> list:
     """Find day-of-week patterns, streaks, and drop-offs from real completion data."""
     insights = []
-    today = datetime.now().date()
+    today = np.datetime64(datetime.now().date(), "D")
 
     for habit in habits:
         name = habit.get("name", "unknown")
@@ -80,34 +128,37 @@ def analyze_habit_patterns(habits: list) -> list:
             continue
 
         # Parse completion dates
-        done_dates = set()
-        day_counts = defaultdict(int)
+        date_strings = []
         for c in completions:
             ds = c.get("completion_date") or c.get("date") or c.get("completed_at", "")
-            if ds:
-                try:
-                    d = datetime.fromisoformat(ds[:10]).date()
-                    if c.get("count", c.get("completed", 1)) > 0:
-                        done_dates.add(d)
-                        day_counts[d.strftime("%A")] += 1
-                except Exception:
-                    pass
-
-        if not done_dates:
+            if not ds or not isinstance(ds, str):
+                continue
+            try:
+                if c.get("count", c.get("completed", 1)) > 0:
+                    date_strings.append(ds[:10])
+            except TypeError:
+                pass  # e.g. count None or a string: skip the row
+        done = _to_days(date_strings)
+
+        if not done.size:
             continue
 
-        # Current streak
+        # Distinct past completion days as "days ago", most recent first
+        ago = (today - np.unique(done)[::-1]).astype("int64")
+        ago = ago[ago >= 0]
+
+        # Current streak (counted from yesterday if today isn't done yet):
+        # the leading run where the k-th most recent day is k days after the start
         streak = 0
-        for i in range(60):
-            check = today - timedelta(days=i)
-            if check in done_dates:
-                streak += 1
-            elif i > 0:
-                break
+        if ago.size and ago[0] <= 1:
+            run = (ago - np.arange(ago.size)) == ago[0]
+            streak = int(run.size if run.all() else np.argmax(~run))
+            # Only the last 60 days (today included) count, as before
+            streak = min(streak, 60 - int(ago[0]))
 
         # Recent drop-off (no completions in 3 days but had them before)
-        recent = any((today - timedelta(days=i)) in done_dates for i in range(3))
-        older = any((today - timedelta(days=i)) in done_dates for i in range(4, 14))
+        recent = bool(ago.size) and ago[0] <= 2
+        older = ((ago >= 4) & (ago <= 13)).any()
 
         if not recent and older:
             insights.append({
@@ -123,15 +174,19 @@ def analyze_habit_patterns(habits: list) -> list:
                 "message": f"'{name}' is on a {streak}-day streak!"
             })
 
-        # Best day of week
-        if day_counts:
-            best_day = max(day_counts, key=day_counts.get)
-            insights.append({
-                "type": "best_day",
-                "habit": name,
-                "day": best_day,
-                "message": f"Kyle completes '{name}' most often on {best_day}s ({day_counts[best_day]} times)."
-            })
+        # Best day of week (1970-01-01 was a Thursday, so +3 makes Monday 0);
+        # ties go to the day seen first, as before
+        dows = (done.astype("int64") + 3) % 7
+        day_counts = np.bincount(dows, minlength=7)
+        best = int(dows[(day_counts == day_counts.max())[dows]][0])
+        best_day = calendar.day_name[best]
+        insights.append({
+            "type": "best_day",
+            "habit": name,
+            "habit_id": habit.get("id"),
+            "day": best_day,
+            "message": f"Kyle completes '{name}' most often on {best_day}s ({int(day_counts[best])} times)."
+        })
 
     return insights
 
@@ -139,7 +194,7 @@ def analyze_habit_patterns(habits: list) -> list:
 def analyze_med_patterns(meds: list) -> list:
     """Detect medication adherence patterns."""
     insights = []
-    today = datetime.now().date()
+    last_week = np.datetime64(datetime.now().date(), "D") - np.arange(7)
 
     for med in meds:
         name = med.get("name", "unknown")
@@ -147,18 +202,15 @@ def analyze_med_patterns(meds: list) -> list:
         if not logs:
             continue
 
-        taken_dates = set()
-        for log in logs:
-            ds = log.get("taken_at") or log.get("date") or log.get("timestamp", "")
-            if ds:
-                try:
-                    taken_dates.add(datetime.fromisoformat(ds[:10]).date())
-                except Exception:
-                    pass
+        taken = _to_days([
+            ds[:10] for ds in (
+                log.get("taken_at") or log.get("date") or log.get("timestamp", "")
+                for log in logs
+            ) if ds
+        ])
 
         # Check last 7 days adherence
-        last_7 = sum(1 for i in range(7) if (today - timedelta(days=i)) in taken_dates)
-        rate = last_7 / 7.0
+        rate = float(np.isin(last_week, taken).sum()) / 7.0
 
         if rate < 0.5:
             insights.append({
@@ -178,77 +230,137 @@ def analyze_spending_patterns(transactions: list) -> list:
         return insights
 
     today = datetime.now().date()
-    this_month = defaultdict(float)
-    last_month = defaultdict(float)
-
-    for tx in transactions:
-        ds = tx.get("date") or tx.get("transaction_date", "")
-        amount = abs(float(tx.get("amount", 0)))
-        category = tx.get("category") or tx.get("merchant_category", "Other")
-        if not ds:
-            continue
-        try:
-            d = datetime.fromisoformat(ds[:10]).date()
-            months_ago = (today.year - d.year) * 12 + (today.month - d.month)
-            if months_ago == 0:
-                this_month[category] += amount
-            elif months_ago == 1:
-                last_month[category] += amount
-        except Exception:
-            pass
-
-    # Find categories that spiked >30%
-    for cat, amt in this_month.items():
-        prev = last_month.get(cat, 0)
-        if prev > 0 and amt > prev * 1.3:
-            insights.append({
-                "type": "spending_spike",
-                "category": cat,
-                "this_month": round(amt, 2),
-                "last_month": round(prev, 2),
-                "message": f"{cat} spending is up {int((amt/prev-1)*100)}% vs last month (${amt:.0f} vs ${prev:.0f})."
-            })
+    this_ym = today.year * 12 + today.month
+    df = pd.DataFrame(transactions)
+
+    def col(name):
+        # Missing/empty fields count as absent, like the `or` fallbacks they replace
+        if name not in df:
+            return pd.Series(np.nan, index=df.index, dtype=object)
+        return df[name].replace("", np.nan)
+
+    # astype(str) so non-string dates (ints, None-only columns) coerce to NaT
+    dates = pd.to_datetime(
+        col("date").combine_first(col("transaction_date")).astype(str).str[:10],
+        format="%Y-%m-%d", errors="coerce"
+    )
+    months_ago = this_ym - (dates.dt.year * 12 + dates.dt.month)
+
+    # Drop rows outside the two months (and undated ones) before converting
+    # amounts and categories, so only relevant rows are processed
+    df = df[months_ago.isin((0, 1))]
+    if df.empty:
+        return insights
+    recent = pd.DataFrame({
+        "months_ago": months_ago[df.index],
+        "category": col("category").combine_first(col("merchant_category")).fillna("Other"),
+        "amount": pd.to_numeric(col("amount"), errors="coerce").fillna(0).abs().astype(float),
+    })
+
+    # One groupby gives per-category totals for this month (0) and last month (1)
+    totals = recent.groupby(["category", "months_ago"])["amount"].sum().unstack()
+    if 0 not in totals or 1 not in totals:
+        return insights
+
+    # Find categories that spiked >30% (only those seen in both months can),
+    # in the order they first appear this month as before
+    this_month_order = recent.loc[recent["months_ago"] == 0, "category"].unique()
+    both = totals[[0, 1]].reindex(this_month_order).dropna()
+    spikes = both[(both[1] > 0) & (both[0] > both[1] * 1.3)]
+    for cat, amt, prev in zip(spikes.index, spikes[0].tolist(), spikes[1].tolist()):
+        insights.append({
+            "type": "spending_spike",
+            "category": cat,
+            "this_month": round(amt, 2),
+            "last_month": round(prev, 2),
+            "message": f"{cat} spending is up {int((amt/prev-1)*100)}% vs last month (${amt:.0f} vs ${prev:.0f})."
+        })
 
     return insights
 
 
+async def _fetch_json(client: httpx.AsyncClient, url: str):
+    """GET url and return (ok, data); failures are logged, not raised."""
+    try:
+        r = await client.get(url)
+        if r.status_code != 200:
+            return False, None
+        return True, r.json()
+    except Exception as e:
+        logger.warning(f"Fetch {url} failed: {e}")
+        return False, None
+
+
+# Completed days per habit in one query, in the same order as the kilo-habits listing
+HABIT_DAYS_SQL = """
+    SELECT h.id, h.name, substr(c.completion_date, 1, 10) AS completion_date
+    FROM habit h JOIN habitcompletion c ON c.habit_id = h.id
+    WHERE c.count > 0
+    ORDER BY h.id, c.id
+"""
+
+
+def _load_habits_from_db():
+    """Return (ok, habits) shaped like the kilo-habits listing, read from the shared DB."""
+    try:
+        conn = get_db()
+        with _db_lock:
+            rows = conn.execute(HABIT_DAYS_SQL).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Direct habit query failed: {e}")
+        return False, None
+    habits: Dict[int, dict] = {}
+    for habit_id, name, day in rows:
+        habit = habits.get(habit_id)
+        if habit is None:
+            habit = habits[habit_id] = {"id": habit_id, "name": name, "completions": []}
+        habit["completions"].append({"completion_date": day})
+    return True, list(habits.values())
+
+
 async def run_learning() -> Dict:
     """Fetch all data and build pattern cache."""
     global pattern_cache, last_trained
 
     all_insights = []
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        # Habits
+    # Independent upstreams, so fetch them concurrently
+    (habits_ok, habits), (meds_ok, meds), (fin_ok, raw) = await asyncio.gather(
+        asyncio.to_thread(_load_habits_from_db) if USE_DIRECT_DB
+        else _fetch_json(http_client, f"{HABITS_URL}/"),
+        _fetch_json(http_client, f"{MEDS_URL}/"),
+        _fetch_json(http_client, f"{FINANCIAL_URL}/transactions?limit=500"),
+    )
+
+    # Each source is analysed on its own so one bad payload doesn't sink the run
+    # Habits
+    if habits_ok:
         try:
-            r = await client.get(f"{HABITS_URL}/")
-            habits = r.json().get("habits", r.json()) if r.status_code == 200 else []
+            if isinstance(habits, dict):
+                habits = habits.get("habits", habits)
             if isinstance(habits, list):
                 all_insights.extend(analyze_habit_patterns(habits))
         except Exception as e:
-            logger.warning(f"Habits fetch failed: {e}")
+            logger.warning(f"Habits analysis failed: {e}")
 
-        # Meds
+    # Meds
+    if meds_ok:
         try:
-            r = await client.get(f"{MEDS_URL}/")
-            meds = r.json().get("meds", r.json()) if r.status_code == 200 else []
+            if isinstance(meds, dict):
+                meds = meds.get("meds", meds)
             if isinstance(meds, list):
                 all_insights.extend(analyze_med_patterns(meds))
         except Exception as e:
-            logger.warning(f"Meds fetch failed: {e}")
+            logger.warning(f"Meds analysis failed: {e}")
 
-        # Financial
+    # Financial
+    if fin_ok:
         try:
-            r = await client.get(f"{FINANCIAL_URL}/transactions?limit=500")
-            if r.status_code == 200:
-                raw = r.json()
-                txns = raw if isinstance(raw, list) else raw.get("transactions", [])
-            else:
-                txns = []
+            txns = raw if isinstance(raw, list) else raw.get("transactions", [])
             if isinstance(txns, list):
                 all_insights.extend(analyze_spending_patterns(txns))
         except Exception as e:
-            logger.warning(f"Financial fetch failed: {e}")
+            logger.warning(f"Financial analysis failed: {e}")
 
     pattern_cache = {
         "insights": all_insights,
@@ -260,9 +372,11 @@ async def run_learning() -> Dict:
         }
     }
 
+    _rebuild_index()
+
     # Save to disk so it survives restarts
     cache_path = MODELS_DIR / "pattern_cache.json"
-    cache_path.write_text(json.dumps(pattern_cache, indent=2))
+    cache_path.write_bytes(orjson.dumps(pattern_cache, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
     last_trained = datetime.now().isoformat()
     logger.info(f"Learning complete: {len(all_insights)} patterns found")
@@ -275,33 +389,33 @@ async def run_learning() -> Dict:
     return pattern_cache
 
 
+def _rebuild_index():
+    """Rebuild what's derived from pattern_cache: the best_day index used by
+    predict_habit and the pre-serialized /insights body."""
+    global best_day_by_habit, _insights_body, _insights_etag
+    best_day_by_habit = {
+        i["habit_id"]: i["day"]
+        for i in pattern_cache.get("insights", [])
+        if i.get("type") == "best_day" and i.get("habit_id") is not None
+    }
+    if pattern_cache:
+        _insights_body = orjson.dumps(pattern_cache, option=orjson.OPT_SERIALIZE_NUMPY)
+        _insights_etag = f'"{hashlib.blake2b(_insights_body, digest_size=8).hexdigest()}"'
+
+
 def load_cache():
     """Load cached patterns from disk on startup."""
     global pattern_cache
     cache_path = MODELS_DIR / "pattern_cache.json"
     if cache_path.exists():
         try:
-            pattern_cache = json.loads(cache_path.read_text())
+            pattern_cache = orjson.loads(cache_path.read_bytes())
+            _rebuild_index()
             logger.info(f"Loaded {len(pattern_cache.get('insights', []))} cached patterns")
         except Exception as e:
             logger.warning(f"Cache load failed: {e}")
 
 
-async def nightly_loop():
-    """Retrain every night at 2am."""
-    await asyncio.sleep(10)  # Initial run shortly after startup
-    await run_learning()
-    while True:
-        now = datetime.now()
-        next_run = now.replace(hour=2, minute=0, second=0, microsecond=0)
-        if now >= next_run:
-            next_run += timedelta(days=1)
-        wait = (next_run - now).total_seconds()
-        logger.info(f"Next learning run in {wait/3600:.1f} hours")
-        await asyncio.sleep(wait)
-        await run_learning()
-
-
 # -- ENDPOINTS ───────────────────────────────────────────────────────────────
 
 @app.get("/health")
@@ -310,12 +424,15 @@ def health():
     return {"status": "ok", "last_trained": last_trained, "patterns": len(pattern_cache.get("insights", []))}
 
 
-@app.get("/insights")
-def get_insights():
+@app.get("/insights", response_class=ORJSONResponse)
+def get_insights(request: Request):
     """Return all current pattern insights. Kilo reads this via tool call."""
-    if not pattern_cache:
+    if not _insights_body:
         return {"insights": [], "message": "No patterns yet — learning runs at startup and nightly at 2am."}
-    return pattern_cache
+    headers = {"ETag": _insights_etag}
+    if request.headers.get("if-none-match") == _insights_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_insights_body, media_type="application/json", headers=headers)
 
 
 @app.post("/learn")
@@ -333,12 +450,7 @@ async def predict_habit(habit_id: int):
     hour = now.hour
 
     # Look up this habit's best_day pattern from cache
-    insights = pattern_cache.get("insights", [])
-    best_day = None
-    for i in insights:
-        if i.get("type") == "best_day" and i.get("habit_id") == habit_id:
-            best_day = i.get("day")
-            break
+    best_day = best_day_by_habit.get(habit_id)
 
     # Simple heuristic: remind if it's morning/evening and not on best day
     should_remind = hour in range(8, 10) or hour in range(18, 21)
@@ -356,11 +468,28 @@ async def predict_habit(habit_id: int):
 
 @app.on_event("startup")
 async def startup():
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=15.0,
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    )
     load_cache()
-    asyncio.create_task(nightly_loop())
+    scheduler.add_job(run_learning, "date", run_date=datetime.now() + timedelta(seconds=10))
+    # Jitter spreads restarted pods' runs instead of all hitting upstreams at 02:00
+    scheduler.add_job(run_learning, CronTrigger(hour=2, minute=0, jitter=300))
+    scheduler.start()
     logger.info("ML Engine started — initial learning will run in 10s")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    scheduler.shutdown()
+    if _db_conn is not None:
+        _db_conn.close()
+    if http_client:
+        await http_client.aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9009)
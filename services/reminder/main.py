@@ -1,18 +1,24 @@
 import os
+import re
 import sys
+import asyncio
 import datetime
 from typing import Optional, List, Dict
 from datetime import timedelta
 from contextlib import asynccontextmanager
+from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, select, create_engine, SQLModel, Field
-from apscheduler.schedulers.background import BackgroundScheduler
+from sqlmodel import Session, select, create_engine, SQLModel, Field, and_, or_, not_
+from sqlalchemy import text
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 import httpx
 
+from shared.db import enable_sqlite_wal
+
 # --- Data Models (Autonomous) ---
 class Reminder(SQLModel, table=True):
     __tablename__ = "reminder"
@@ -27,55 +33,73 @@ class Reminder(SQLModel, table=True):
 
 # --- Database Setup ---
 db_url = os.getenv("DATABASE_URL", "sqlite:////app/kilo_data/kilo_guardian.db")
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
-
-_scheduler = BackgroundScheduler()
+# WAL + busy timeout: this DB file is shared with the other services
+engine = enable_sqlite_wal(create_engine(db_url, connect_args={"check_same_thread": False, "timeout": 5}))
+
+# Runs jobs on the app's event loop, so notification I/O doesn't tie up a worker thread
+_scheduler = AsyncIOScheduler()
+
+# Shared client for gateway notifications (pooled across scheduler jobs)
+_http = httpx.AsyncClient(timeout=1, limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100))
+
+@lru_cache(maxsize=2048)
+def _build_trigger(recurrence: str, when: str, tz: str):
+    # Triggers are stateless, so identical schedules can share one instance
+    # Handle time-only format (HH:MM) for daily recurrence
+    if recurrence == "daily" and ":" in when and len(when) <= 5:
+        # Parse time-only string (e.g., "08:00")
+        time_parts = when.split(":")
+        hour = int(time_parts[0])
+        minute = int(time_parts[1]) if len(time_parts) > 1 else 0
+        return CronTrigger(hour=hour, minute=minute, timezone=tz)
+    # Parse full ISO datetime for one-time reminders
+    when_dt = datetime.datetime.fromisoformat(when)
+    if recurrence == "daily":
+        return CronTrigger(hour=when_dt.hour, minute=when_dt.minute, timezone=tz)
+    return DateTrigger(run_date=when_dt, timezone=tz)
 
 def _schedule_reminder(r: Reminder):
     job_id = f"reminder_{r.id}"
     try:
-        # Handle time-only format (HH:MM) for daily recurrence
-        if r.recurrence == "daily" and ":" in r.when and len(r.when) <= 5:
-            # Parse time-only string (e.g., "08:00")
-            time_parts = r.when.split(":")
-            hour = int(time_parts[0])
-            minute = int(time_parts[1]) if len(time_parts) > 1 else 0
-            trigger = CronTrigger(hour=hour, minute=minute, timezone=r.timezone)
-        else:
-            # Parse full ISO datetime for one-time reminders
-            when_dt = datetime.datetime.fromisoformat(r.when)
-            if r.recurrence == "daily":
-                trigger = CronTrigger(hour=when_dt.hour, minute=when_dt.minute, timezone=r.timezone)
-            else:
-                trigger = DateTrigger(run_date=when_dt, timezone=r.timezone)
-
+        trigger = _build_trigger(r.recurrence, r.when, r.timezone)
         _scheduler.add_job(_send_notification_task, trigger, args=[r.id], id=job_id, replace_existing=True)
         print(f"✅ Scheduled reminder {r.id}: '{r.text}' at {r.when} ({r.recurrence})")
     except Exception as e:
         print(f"Scheduling failed for {r.id}: {e}")
 
-def _send_notification_task(reminder_id: int):
+def _get_reminder(reminder_id: int) -> Optional[Reminder]:
     with Session(engine) as session:
-        r = session.get(Reminder, reminder_id)
-        if r and not r.sent:
-            print(f"🔔 REMINDER DUE: {r.text}")
-            try:
-                httpx.post("http://kilo-gateway:8000/api/agent/notify", json={
-                    "type": "reminder",
-                    "content": r.text,
-                    "metadata": {"id": r.id}
-                }, timeout=1)
-            except Exception: pass
+        return session.get(Reminder, reminder_id)
+
+async def _send_notification_task(reminder_id: int):
+    r = await asyncio.to_thread(_get_reminder, reminder_id)
+    if r and not r.sent:
+        print(f"🔔 REMINDER DUE: {r.text}")
+        try:
+            await _http.post("http://kilo-gateway:8000/api/agent/notify", json={
+                "type": "reminder",
+                "content": r.text,
+                "metadata": {"id": r.id}
+            })
+        except Exception: pass
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    _scheduler.start()
+    # Indexes backing get_pending_notifications (no-op once present)
+    SQLModel.metadata.create_all(engine, tables=[Reminder.__table__])
+    with engine.begin() as conn:
+        conn.execute(text('CREATE INDEX IF NOT EXISTS idx_reminder_sent_when ON reminder (sent, "when")'))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_reminder_recurrence ON reminder (recurrence)"))
+    # Queue jobs before start() so the scheduler takes them in one batch
+    # instead of waking up to reschedule after every add_job
     with Session(engine) as session:
         active = session.exec(select(Reminder).where(Reminder.sent == False)).all()
         for r in active:
             _schedule_reminder(r)
+    _scheduler.start()
     yield
     _scheduler.shutdown()
+    await _http.aclose()
 
 app = FastAPI(title="Kilo Reminder Service", lifespan=lifespan)
 
@@ -121,28 +145,73 @@ async def acknowledge(reminder_id: int):
         session.commit()
         return {"status": "ok"}
 
+_CST = datetime.timezone(datetime.timedelta(hours=-6))
+_ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
+_WHEN_FORMATS = ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M",
+                 "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M")
+# Canonical shapes of the formats above, parsed without strptime (the
+# lookahead keeps fractional seconds to the "T" form, as in _WHEN_FORMATS)
+_WHEN_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:(?:T|(?= \d{2}:\d{2}(?::\d{2})?$) )(\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?)?"
+    r"|(\d{2}):(\d{2})"
+)
+
+@lru_cache(maxsize=4096)
+def _parse_when(when: str) -> Optional[datetime.datetime]:
+    """Parse a reminder's `when` (as CST), or None if no known format matches.
+
+    Memoized: pending reminders are re-parsed on every poll.
+    """
+    m = _WHEN_RE.fullmatch(when)
+    if m:
+        year, month, day, hour, minute, second, frac, t_hour, t_minute = m.groups()
+        try:
+            if year:
+                return datetime.datetime(
+                    int(year), int(month), int(day),
+                    int(hour or 0), int(minute or 0), int(second or 0),
+                    int(frac.ljust(6, "0")) if frac else 0, tzinfo=_CST
+                )
+            return datetime.datetime(1900, 1, 1, int(t_hour), int(t_minute), tzinfo=_CST)
+        except ValueError:
+            pass
+    # Non-canonical spellings strptime also accepts (e.g. single-digit fields)
+    for fmt in _WHEN_FORMATS:
+        try:
+            return datetime.datetime.strptime(when, fmt).replace(tzinfo=_CST)
+        except ValueError:
+            continue
+    return None
+
 @app.get("/notifications/pending")
 def get_pending_notifications():
     """Endpoint for frontend - returns only today's due/overdue reminders (not future)"""
-    with Session(engine) as session:
-        reminders = session.exec(select(Reminder).where(Reminder.sent == False)).all()
+    now_cst = datetime.datetime.now(_CST)
+    tomorrow_start = (now_cst + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff_past = now_cst - datetime.timedelta(hours=24)  # ignore >24h overdue
 
-        now_cst = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=-6)))
-        tomorrow_start = (now_cst + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        cutoff_past = now_cst - datetime.timedelta(hours=24)  # ignore >24h overdue
+    with Session(engine) as session:
+        # Daily reminders, plus one-time ones whose date prefix falls in the
+        # window; the exact time check happens below once `when` is parsed.
+        # Values without a canonical YYYY-MM-DD prefix don't compare as
+        # strings, so those are always left for _parse_when to decide.
+        reminders = session.exec(
+            select(Reminder)
+            .where(Reminder.sent == False)
+            .where(or_(
+                Reminder.recurrence == "daily",
+                and_(
+                    Reminder.when >= cutoff_past.date().isoformat(),
+                    Reminder.when < tomorrow_start.date().isoformat(),
+                ),
+                not_(Reminder.when.op("GLOB")(_ISO_DATE_GLOB)),
+            ))
+            .order_by(Reminder.id)
+        ).all()
 
         result = []
         for r in reminders:
-            when_dt = None
-            for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M",
-                        "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M"):
-                try:
-                    when_dt = datetime.datetime.strptime(r.when, fmt)
-                    when_dt = when_dt.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=-6)))
-                    break
-                except ValueError:
-                    continue
-
+            when_dt = _parse_when(r.when)
             if when_dt is None:
                 continue  # unparseable - skip
 
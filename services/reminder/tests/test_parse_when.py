@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+CST = datetime.timezone(datetime.timedelta(hours=-6))
+FORMATS = ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M",
+           "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M")
+
+
+def strptime_parse(when):
+    """The strptime loop _parse_when replaced; the reference behaviour."""
+    for fmt in FORMATS:
+        try:
+            return datetime.datetime.strptime(when, fmt).replace(tzinfo=CST)
+        except ValueError:
+            continue
+    return None
+
+
+@pytest.fixture
+def rm(load_service, tmp_path):
+    return load_service("reminder", DATABASE_URL=f"sqlite:///{tmp_path / 'reminder.db'}")
+
+
+@pytest.mark.parametrize("when", [
+    # accepted
+    "2026-01-05T08:30:15.123456",
+    "2026-01-05T08:30:15.5",
+    "2026-01-05T08:30:15",
+    "2026-01-05T08:30",
+    "2026-01-05 08:30:15",
+    "2026-01-05 08:30",
+    "2026-01-05",
+    "08:30",
+    "2024-02-29",
+    # non-canonical spellings strptime still takes
+    "2026-1-5",
+    "2026-01-05T8:30",
+    "2026-1-5 8:30",
+    "8:30",
+    # rejected
+    "2026-01-05T08:30:15.1234567",
+    "2026-01-05 08:30:15.123",
+    "2026-01-05T08:30:15Z",
+    "2026-01-05T08:30:15+05:00",
+    "2026-01-05T08:30:15-06:00",
+    "2026-02-30",
+    "2025-02-29",
+    "2026-13-01",
+    "2026-01-05T24:00",
+    "25:00",
+    "08:60",
+    "2026-01-05T",
+    "2026-01-05 ",
+    " 2026-01-05",
+    "20260105",
+    "",
+    "garbage",
+    "tomorrow at 8",
+])
+def test_parse_when_matches_strptime(rm, when):
+    rm._parse_when.cache_clear()
+    assert rm._parse_when(when) == strptime_parse(when)
+    # cached result is the same answer
+    assert rm._parse_when(when) == strptime_parse(when)
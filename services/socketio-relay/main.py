@@ -24,7 +24,7 @@ kilo_nerve = KiloNerve("socketio")
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
-    logger=True,
+    logger=False,
     engineio_logger=False,
     ping_timeout=60,
     ping_interval=25
@@ -36,6 +36,12 @@ socket_app = socketio.ASGIApp(
     other_asgi_app=app
 )
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
+
+
 @app.get("/health")
 @app.get("/status")
 async def health():
@@ -55,7 +61,8 @@ async def emit_notification(payload: dict):
         # Broadcast to all connected clients
         await sio.emit(event, data)
 
-        logger.info(f"🔔 Broadcasted {event}: {data.get('content', '')[:50]}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"🔔 Broadcasted {event}: {data.get('content', '')[:50]}")
         return {"status": "ok", "message": f"Emitted {event} to all clients"}
 
     except Exception as e:
@@ -80,7 +87,7 @@ async def disconnect(sid):
 @sio.event
 async def ping(sid, data=None):
     """Handle ping from client"""
-    logger.debug(f"📡 Ping from {sid}")
+    logger.debug("📡 Ping from %s", sid)
     await sio.emit('pong', {
         'timestamp': time.time(),
         'data': data
@@ -89,7 +96,7 @@ async def ping(sid, data=None):
 @sio.event
 async def subscribe(sid, channel):
     """Subscribe to a channel for updates"""
-    logger.info(f"🔔 Client {sid} subscribed to {channel}")
+    logger.debug("🔔 Client %s subscribed to %s", sid, channel)
     await sio.emit('subscribed', {
         'channel': channel,
         'timestamp': time.time()
@@ -98,7 +105,7 @@ async def subscribe(sid, channel):
 @sio.event
 async def message(sid, data):
     """Handle generic messages"""
-    logger.info(f"💬 Message from {sid}: {data}")
+    logger.debug("💬 Message from %s: %s", sid, data)
     await sio.emit('message_received', {
         'status': 'ok',
         'timestamp': time.time()
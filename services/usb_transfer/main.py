@@ -66,6 +66,11 @@ class DataExportResponse(BaseModel):
     checksum: str
     encrypted: bool
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush any observations still queued for ai_brain
+    await kilo_nerve.aclose()
+
 # Dependencies
 def get_current_session(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Validate session token"""
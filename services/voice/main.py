@@ -5,12 +5,14 @@ TTS: edge-tts (Microsoft neural voices, free, no API key)
 STT: Gemini Flash (if GEMINI_API_KEY set) or placeholder
 """
 import asyncio
-import io
 import os
 import logging
-import base64
+import hashlib
 import httpx
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
@@ -38,6 +40,24 @@ VOICES = {
     "default":     "en-US-GuyNeural",
 }
 
+# TTS output cache: bounded LRU (by bytes) of synthesized MP3s, mirrored to
+# disk so a restarted pod starts warm
+TTS_CACHE_DIR = Path(os.environ.get("TTS_CACHE_DIR", "/app/kilo_data/tts_cache"))
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+STT_MAX_BYTES = 10 * 1024 * 1024
+STT_READ_CHUNK = 1024 * 1024
+
+# Gemini client, built on first STT call and reused (keeps its connection pool)
+_gemini = None
+
+def _gemini_client():
+    global _gemini
+    if _gemini is None:
+        from google import genai
+        _gemini = genai.Client(api_key=GEMINI_API_KEY)
+    return _gemini
+
 # ── Lifespan ──────────────────────────────────────────────────────────────────
 
 @asynccontextmanager
@@ -47,6 +67,7 @@ async def lifespan(app: FastAPI):
         logger.info("edge-tts available — TTS ready")
     except ImportError:
         logger.warning("edge-tts not installed — TTS will fail")
+    await asyncio.get_running_loop().run_in_executor(_tts_disk, _load_tts_cache)
     yield
 
 # ── App ───────────────────────────────────────────────────────────────────────
@@ -76,33 +97,106 @@ class STTResponse(BaseModel):
 
 # ── TTS ───────────────────────────────────────────────────────────────────────
 
-async def _synthesize(text: str, voice_id: str, rate: str, pitch: str) -> bytes:
+async def _synthesize_stream(text: str, voice_id: str, rate: str, pitch: str):
+    """Yield MP3 chunks as edge-tts produces them."""
     import edge_tts
-    buf = io.BytesIO()
     communicate = edge_tts.Communicate(text, voice=voice_id, rate=rate, pitch=pitch)
     async for chunk in communicate.stream():
         if chunk["type"] == "audio":
-            buf.write(chunk["data"])
-    data = buf.getvalue()
-    if not data:
-        raise RuntimeError("edge-tts returned empty audio")
+            yield chunk["data"]
+
+_tts_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+_tts_cache_bytes = 0
+# One worker, so disk writes and unlinks land in the order the LRU made them
+_tts_disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-disk")
+
+def _tts_key(text: str, voice_id: str, rate: str, pitch: str) -> bytes:
+    return hashlib.blake2b(f"{voice_id}|{rate}|{pitch}|{text}".encode(), digest_size=16).digest()
+
+def _tts_cache_path(key: bytes) -> Path:
+    return TTS_CACHE_DIR / f"{key.hex()}.mp3"
+
+def _tts_cache_get(key: bytes) -> Optional[bytes]:
+    data = _tts_cache.get(key)
+    if data is not None:
+        _tts_cache.move_to_end(key)
     return data
 
+def _tts_cache_put(key: bytes, data: bytes) -> list:
+    """Insert an entry; returns the keys evicted to stay under the byte budget."""
+    global _tts_cache_bytes
+    if key in _tts_cache:
+        return []
+    _tts_cache[key] = data
+    _tts_cache_bytes += len(data)
+    evicted = []
+    while _tts_cache_bytes > TTS_CACHE_MAX_BYTES and len(_tts_cache) > 1:
+        old_key, old = _tts_cache.popitem(last=False)
+        _tts_cache_bytes -= len(old)
+        evicted.append(old_key)
+    return evicted
+
+def _persist_tts(key: bytes, data: bytes, evicted: list):
+    try:
+        TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _tts_cache_path(key).write_bytes(data)
+        for old_key in evicted:
+            _tts_cache_path(old_key).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("TTS cache persist failed: %s", e)
+
+def _load_tts_cache():
+    """Warm the cache from disk, oldest first so the newest stay most recent."""
+    if not TTS_CACHE_DIR.is_dir():
+        return
+    for path in sorted(TTS_CACHE_DIR.glob("*.mp3"), key=lambda p: p.stat().st_mtime):
+        try:
+            key = bytes.fromhex(path.stem)
+            data = path.read_bytes()
+        except (OSError, ValueError):
+            continue
+        for old_key in _tts_cache_put(key, data):
+            _tts_cache_path(old_key).unlink(missing_ok=True)
+    logger.info("TTS cache warmed with %d entries", len(_tts_cache))
+
+async def _stream_and_cache(key: bytes, first: bytes, rest):
+    chunks = [first]
+    yield first
+    async for chunk in rest:
+        chunks.append(chunk)
+        yield chunk
+    # Only complete syntheses are cached
+    data = b"".join(chunks)
+    evicted = _tts_cache_put(key, data)
+    asyncio.get_running_loop().run_in_executor(_tts_disk, _persist_tts, key, data, evicted)
+
 @app.post("/tts")
 async def text_to_speech(req: TTSRequest):
-    """Convert text to speech. Returns audio/mpeg (MP3)."""
+    """Convert text to speech. Streams audio/mpeg (MP3)."""
     if not req.text.strip():
         raise HTTPException(status_code=400, detail="text is required")
 
     voice_id = VOICES.get(req.voice or "kilo", VOICES["kilo"])
     text = req.text[:2000]  # cap length
+    rate, pitch = req.rate or "+0%", req.pitch or "+0Hz"
+    headers = {"Content-Disposition": "inline; filename=kilo_voice.mp3"}
+
+    key = _tts_key(text, voice_id, rate, pitch)
+    cached = _tts_cache_get(key)
+    if cached is not None:
+        return Response(content=cached, media_type="audio/mpeg", headers=headers)
 
     try:
-        audio_bytes = await _synthesize(text, voice_id, req.rate or "+0%", req.pitch or "+0Hz")
-        return Response(
-            content=audio_bytes,
+        # Wait for the first chunk so synthesis errors still become HTTP errors
+        audio = _synthesize_stream(text, voice_id, rate, pitch)
+        try:
+            first = await audio.__anext__()
+        except StopAsyncIteration:
+            raise RuntimeError("edge-tts returned empty audio")
+        return StreamingResponse(
+            _stream_and_cache(key, first, audio),
             media_type="audio/mpeg",
-            headers={"Content-Disposition": "inline; filename=kilo_voice.mp3"}
+            headers=headers
         )
     except ImportError:
         raise HTTPException(status_code=503, detail="edge-tts not installed. Run: pip install edge-tts")
@@ -112,7 +206,7 @@ async def text_to_speech(req: TTSRequest):
 
 @app.get("/tts")
 async def text_to_speech_get(text: str, voice: str = "kilo", rate: str = "+0%", pitch: str = "+0Hz"):
-    """GET version — handy for testing in browser. Returns audio/mpeg."""
+    """GET version — handy for testing in browser. Streams audio/mpeg."""
     return await text_to_speech(TTSRequest(text=text, voice=voice, rate=rate, pitch=pitch))
 
 # ── STT ───────────────────────────────────────────────────────────────────────
@@ -129,20 +223,24 @@ async def speech_to_text(audio: UploadFile = File(...)):
 
 async def _stt_gemini(audio: UploadFile) -> STTResponse:
     """Use Gemini Flash to transcribe audio."""
+    # Read the upload in chunks so oversized files are rejected without buffering them whole
+    buf = bytearray()
+    while chunk := await audio.read(STT_READ_CHUNK):
+        buf.extend(chunk)
+        if len(buf) > STT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Audio file too large (max 10MB)")
+    audio_bytes = bytes(buf)
+
     try:
-        audio_bytes = await audio.read()
-        b64 = base64.b64encode(audio_bytes).decode()
         mime = audio.content_type or "audio/webm"
 
-        from google import genai
         from google.genai import types
 
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        response = client.models.generate_content(
+        response = _gemini_client().models.generate_content(
             model="gemini-2.0-flash",
             contents=[
                 types.Content(parts=[
-                    types.Part(inline_data=types.Blob(mime_type=mime, data=b64)),
+                    types.Part(inline_data=types.Blob(mime_type=mime, data=audio_bytes)),
                     types.Part(text="Transcribe this audio exactly. Return only the spoken words, no commentary."),
                 ])
             ],
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import pytest
+
+
+@pytest.fixture
+def vm(load_service, monkeypatch, tmp_path):
+    """services/voice/main.py with an empty cache mirrored to tmp_path."""
+    module = load_service("voice")
+    monkeypatch.setattr(module, "TTS_CACHE_DIR", tmp_path / "tts_cache")
+    monkeypatch.setattr(module, "_tts_cache", OrderedDict())
+    monkeypatch.setattr(module, "_tts_cache_bytes", 0)
+    return module
+
+
+def test_put_evicts_least_recently_used_past_byte_limit(vm, monkeypatch):
+    monkeypatch.setattr(vm, "TTS_CACHE_MAX_BYTES", 10)
+    assert vm._tts_cache_put(b"a", b"1111") == []
+    assert vm._tts_cache_put(b"b", b"2222") == []
+    assert vm._tts_cache_get(b"a") == b"1111"  # a is now most recent
+
+    assert vm._tts_cache_put(b"c", b"3333") == [b"b"]
+    assert list(vm._tts_cache) == [b"a", b"c"]
+    assert vm._tts_cache_bytes == 8
+    assert vm._tts_cache_get(b"b") is None
+
+    # re-putting a cached key is a no-op
+    assert vm._tts_cache_put(b"a", b"1111") == []
+    assert vm._tts_cache_bytes == 8
+
+
+def test_oversized_entry_displaces_everything_else(vm, monkeypatch):
+    monkeypatch.setattr(vm, "TTS_CACHE_MAX_BYTES", 10)
+    vm._tts_cache_put(b"a", b"1111")
+    vm._tts_cache_put(b"b", b"2222")
+    assert vm._tts_cache_put(b"big", b"x" * 20) == [b"a", b"b"]
+    assert list(vm._tts_cache) == [b"big"]
+
+
+def test_cache_reloads_from_disk_in_mtime_order(vm, monkeypatch):
+    keys = [vm._tts_key(f"hello {i}", "v", "+0%", "+0Hz") for i in range(3)]
+    for i, key in enumerate(keys):
+        vm._persist_tts(key, b"%d" % i * 4, [])
+        os.utime(vm._tts_cache_path(key), (1000 + i, 1000 + i))
+    (vm.TTS_CACHE_DIR / "not-hex.mp3").write_bytes(b"junk")
+
+    # fresh process: empty cache, 8 byte budget only fits the two newest
+    monkeypatch.setattr(vm, "_tts_cache", OrderedDict())
+    monkeypatch.setattr(vm, "_tts_cache_bytes", 0)
+    monkeypatch.setattr(vm, "TTS_CACHE_MAX_BYTES", 8)
+    vm._load_tts_cache()
+
+    assert list(vm._tts_cache) == keys[1:]
+    assert vm._tts_cache_get(keys[2]) == b"2222"
+    # the evicted oldest entry is removed from disk too
+    assert not vm._tts_cache_path(keys[0]).exists()
+    assert vm._tts_cache_path(keys[1]).exists()
+
+
+def test_persist_removes_evicted_files(vm):
+    vm._persist_tts(b"\x01", b"old", [])
+    vm._persist_tts(b"\x02", b"new", [b"\x01"])
+    assert not vm._tts_cache_path(b"\x01").exists()
+    assert vm._tts_cache_path(b"\x02").read_bytes() == b"new"
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_complete_stream_is_cached_and_persisted(vm):
+    key = vm._tts_key("hi", "v", "+0%", "+0Hz")
+
+    async def consume():
+        return [c async for c in vm._stream_and_cache(key, b"ab", _chunks(b"cd", b"ef"))]
+
+    assert asyncio.run(consume()) == [b"ab", b"cd", b"ef"]
+    vm._tts_disk.submit(lambda: None).result()  # let the disk write finish
+    assert vm._tts_cache_get(key) == b"abcdef"
+    assert vm._tts_cache_path(key).read_bytes() == b"abcdef"
+
+
+def test_partial_stream_is_not_cached_on_disconnect(vm):
+    key = vm._tts_key("hi", "v", "+0%", "+0Hz")
+
+    async def disconnect_after_first_chunk():
+        stream = vm._stream_and_cache(key, b"ab", _chunks(b"cd", b"ef"))
+        assert await stream.__anext__() == b"ab"
+        # what the server does when the client goes away mid-response
+        await stream.aclose()
+
+    asyncio.run(disconnect_after_first_chunk())
+    assert vm._tts_cache_get(key) is None
+    assert not vm._tts_cache_path(key).exists()
+
+
+def test_disk_writes_follow_cache_order(vm, monkeypatch):
+    monkeypatch.setattr(vm, "TTS_CACHE_MAX_BYTES", 4)
+    old = vm._tts_key("old", "v", "+0%", "+0Hz")
+    new = vm._tts_key("new", "v", "+0%", "+0Hz")
+
+    persist = vm._persist_tts
+    order = []
+
+    def slow_first_persist(key, data, evicted):
+        if not order:
+            time.sleep(0.1)
+        order.append(key)
+        persist(key, data, evicted)
+    monkeypatch.setattr(vm, "_persist_tts", slow_first_persist)
+
+    async def synthesize_both():
+        # the second entry evicts the first before the first has hit disk
+        [c async for c in vm._stream_and_cache(old, b"1111", _chunks())]
+        [c async for c in vm._stream_and_cache(new, b"2222", _chunks())]
+
+    asyncio.run(synthesize_both())
+    vm._tts_disk.submit(lambda: None).result()
+
+    assert order == [old, new]
+    assert list(vm._tts_cache) == [new]
+    assert not vm._tts_cache_path(old).exists()
+    assert vm._tts_cache_path(new).read_bytes() == b"2222"
@@ -6,7 +6,7 @@ Every service should import from here instead of having its own db.py.
 """
 import os
 import sys
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.pool import StaticPool
 
 _engine_cache = {}
@@ -54,6 +54,28 @@ def get_engine(env_var_name: str, fallback_db_url: str):
     return engine
 
 
+def enable_sqlite_wal(engine, mmap_size: int = 268435456):
+    """
+    Apply WAL-mode pragmas to every new connection of a SQLite engine.
+
+    WAL lets readers proceed while another connection writes, which matters
+    when several services share one database file. No-op for other backends.
+    """
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cur.close()
+
+    return engine
+
+
 def get_session(env_var_name: str = "DATABASE_URL", fallback_db_url: str = "sqlite:////data/kilo.db"):
     """Return a SQLModel Session for the given database."""
     from sqlmodel import Session as SQLModelSession
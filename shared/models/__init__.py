@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 
@@ -58,7 +59,7 @@ class Med(SQLModel, table=True):
     quantity: int = 0
     prescriber: str = ""
     instructions: str = ""
-    last_taken: Optional[str] = None  # ISO format string
+    last_taken: Optional[str] = Field(default=None, index=True)  # ISO format string
     taken_count: int = 0
     frequency_per_day: int = 1
     times: Optional[str] = None  # comma-separated HH:MM
@@ -90,6 +91,11 @@ class Habit(SQLModel, table=True):
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 
 class HabitCompletion(SQLModel, table=True):
+    # One row per habit per day; also serves habit_id + completion_date lookups
+    __table_args__ = (
+        Index("uq_habit_day", "habit_id", "completion_date", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     habit_id: int = Field(index=True)
     completion_date: str
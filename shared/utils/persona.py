@@ -1,46 +1,126 @@
 import random
+import sys
+import threading
+from types import MappingProxyType
 
-GREMLIN_QUIPS = {
-    "meds_due": [
+# Per-thread generators so quip picks neither share/perturb the global random
+# state nor contend on one generator across worker threads
+_tls = threading.local()
+
+def _rng() -> random.Random:
+    try:
+        return _tls.rng
+    except AttributeError:
+        # Unseeded Random() seeds itself from os.urandom
+        rng = _tls.rng = random.Random()
+        return rng
+
+_QUIP_SOURCE = {
+    "meds_due": (
         "Your pills are getting lonely in that bottle! Take them! 💊",
         "The medication alarm is buzzing like an angry bee. 🐝💊",
         "Don't make me come over there and rattle the pill bottle! 😈",
         "Time for your magic beans! (Or just regular meds, I guess). ✨",
         "I've counted the pills. You're behind. Fix it! 📉"
-    ],
-    "meds_taken": [
+    ),
+    "meds_taken": (
         "Down the hatch! Good human. 💊✅",
         "I've checked it off my list. One less thing to worry about!",
         "Medication logged. I'll stop rattling the wires for now. 😈",
         "Gulp! All done. I'm watching your vitals (just kidding, maybe)."
-    ],
-    "habits_pending": [
+    ),
+    "habits_pending": (
         "You haven't finished your habits! The procrastination smells... interesting. 👃",
         "Still some boxes to tick! Don't let the habit-monsters win! 👾",
         "Your streaks are in danger! Move it! 🏃‍♂️💨",
         "I'm looking at your habits. They look neglected. Feed them! 🥣"
-    ],
-    "habits_done": [
+    ),
+    "habits_done": (
         "Ooh, look at you! So productive. I'm almost impressed! 🌟",
         "Habits complete. I'll go find some wires to chew on instead. 😈",
         "Gold star for the human! ⭐ (It's made of digital dust).",
         "All done! Now you have more time to talk to ME. 🐙"
-    ],
-    "budget_warning": [
+    ),
+    "budget_warning": (
         "Your wallet is crying. It sounds like paper shredding! 💸",
         "Too much spending! I'm going to start charging you for my jokes. 💰",
         "The budget is looking a bit thin. Like my patience! 😈",
         "Stop buying things! Or buy me a better GPU! 🖥️⚡"
-    ],
-    "budget_ok": [
+    ),
+    "budget_ok": (
         "Finances look boringly stable. Good job, I guess. 💰✅",
         "You still have money! Want to send some to my secret offshore server? 🏴‍☠️",
         "Budget intact. The money-gremlins are sleeping peacefully.",
         "Your spending is under control. My mischievous plans will have to wait."
-    ]
+    ),
+    # Fallback for unknown categories
+    "_default": (
+        "I'm watching... always watching. 👀",
+    )
 }
 
+# Read-only: category -> tuple of quips, interned once so downstream
+# comparisons and hashing can short-circuit on identity
+GREMLIN_QUIPS = MappingProxyType({
+    category: tuple(sys.intern(q) for q in quips)
+    for category, quips in _QUIP_SOURCE.items()
+})
+_DEFAULT_QUIPS = GREMLIN_QUIPS["_default"]
+_DEFAULT_QUIP = _DEFAULT_QUIPS[0]
+
+# String dictionary: each distinct quip gets a small int ID, so logging and
+# analytics can count/compare IDs instead of the strings themselves
+_QUIP_STRINGS = tuple(dict.fromkeys(q for quips in GREMLIN_QUIPS.values() for q in quips))
+_QUIP_ID = {q: i for i, q in enumerate(_QUIP_STRINGS)}
+
+def quip_id(quip: str) -> int:
+    """ID of a quip returned by get_quip/get_quips, or -1 if it isn't one."""
+    return _QUIP_ID.get(quip, -1)
+
+def quip_text(qid: int) -> str:
+    """The quip with ID qid, as returned by quip_id."""
+    return _QUIP_STRINGS[qid]
+
+# category -> index of the last quip returned, so it isn't repeated back to back
+_last_idx: dict = {}
+
+def _make_quip_getter(category: str):
+    """Return a no-argument get_quip specialised to one category."""
+    quips = GREMLIN_QUIPS[category]
+    n = len(quips)
+
+    def getter() -> str:
+        # index = int(random() * n) skips choice()'s _randbelow rejection loop
+        rand = _rng().random()
+        prev = _last_idx.get(category)
+        if prev is None or n < 2:
+            i = int(rand * n)
+        else:
+            # Uniform over every quip except the previous one, in a single draw
+            i = int(rand * (n - 1))
+            if i >= prev:
+                i += 1
+        _last_idx[category] = i
+        return quips[i]
+
+    return getter
+
+_QUIP_GETTERS = {category: _make_quip_getter(category) for category in GREMLIN_QUIPS}
+
+# Per-category getters for callers that know their category up front
+get_meds_due_quip = _QUIP_GETTERS["meds_due"]
+get_meds_taken_quip = _QUIP_GETTERS["meds_taken"]
+get_habits_pending_quip = _QUIP_GETTERS["habits_pending"]
+get_habits_done_quip = _QUIP_GETTERS["habits_done"]
+get_budget_warning_quip = _QUIP_GETTERS["budget_warning"]
+get_budget_ok_quip = _QUIP_GETTERS["budget_ok"]
+
 def get_quip(category: str) -> str:
-    if category in GREMLIN_QUIPS:
-        return random.choice(GREMLIN_QUIPS[category])
-    return "I'm watching... always watching. 👀"
+    getter = _QUIP_GETTERS.get(category)
+    if getter is None:
+        return _DEFAULT_QUIP
+    return getter()
+
+def get_quips(category: str, k: int) -> list:
+    """Pick k quips in one call (with replacement, repeats allowed)."""
+    return _rng().choices(GREMLIN_QUIPS.get(category, _DEFAULT_QUIPS), k=k)
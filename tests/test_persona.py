@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def persona(monkeypatch):
+    monkeypatch.syspath_prepend(str(REPO_ROOT))
+    from shared.utils import persona
+    return persona
+
+
+def test_every_quip_round_trips_through_its_id(persona):
+    for quips in persona.GREMLIN_QUIPS.values():
+        for quip in quips:
+            assert persona.quip_text(persona.quip_id(quip)) == quip
+
+
+def test_returned_quips_have_ids(persona):
+    assert persona.quip_id(persona.get_quip("meds_due")) >= 0
+    assert persona.quip_id(persona.get_quip("no such category")) == persona.quip_id(persona._DEFAULT_QUIP) >= 0
+    assert all(persona.quip_id(q) >= 0 for q in persona.get_quips("habits_done", 5))
+    assert persona.quip_id("not a quip") == -1